@@ -2,7 +2,8 @@ import os
 import logging
 import time
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, make_response
+from flask import has_request_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -10,13 +11,41 @@ from werkzeug.utils import secure_filename
 from flask_mail import Mail, Message
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
+import hashlib
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from functools import wraps
-from sqlalchemy import or_, text
+from contextlib import contextmanager
+from sqlalchemy import or_, text, event
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_migrate import Migrate
-from sqlalchemy.pool import NullPool
+from markupsafe import Markup, escape
+from sqlalchemy.pool import NullPool, Pool, QueuePool
+from sqlalchemy.exc import TimeoutError as SATimeoutError
+from sqlalchemy.schema import CreateIndex
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
 import socket
+import threading
+import bisect
+import json
+import smtplib
+import click
+import tempfile
+import hmac
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Image derivatives are skipped without Pillow
+    Image = None
+from types import SimpleNamespace
 
 # Load environment variables from .env file
 load_dotenv()
@@ -58,14 +87,129 @@ def get_database_config():
 
 app.config['SQLALCHEMY_DATABASE_URI'] = get_database_config()
 
+# PROMETHEUS METRICS
+# gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR at a directory shared by all workers so
+# /metrics aggregates them; without it (flask run, CLI) metrics cover this process only.
+METRICS_MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # optional bearer token required by /metrics
+METRICS_RSS_INTERVAL = 10  # seconds between resident memory samples per worker
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by Flask endpoint, method and status',
+    ['endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'Requests currently being handled', multiprocess_mode='livesum'
+)
+DB_QUERIES = Counter('db_queries_total', 'SQL statements executed, by Flask endpoint', ['endpoint'])
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds', 'SQL statement latency',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out_connections', 'Pooled connections currently checked out', multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+DB_POOL_TIMEOUTS = Counter('db_pool_timeouts_total', 'Pool checkouts that timed out')
+DB_POOL_CONNECTS = Counter('db_pool_connects_total', 'New database connections opened by the pool')
+CACHE_LOOKUPS = Counter('app_cache_lookups_total', 'In-process cache lookups', ['cache', 'result'])
+WORKER_RSS = Gauge(
+    'app_worker_resident_memory_bytes', 'Resident memory of each worker process', multiprocess_mode='liveall'
+)
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+# CONNECTION POOL INSTRUMENTATION
+pool_stats_lock = threading.Lock()
+pool_stats = {
+    'checkouts': 0,
+    'connects': 0,
+    'timeouts': 0,
+    'wait_total': 0.0,
+    'wait_max': 0.0,
+}
+
+class PoolStatsMixin:
+    """Time checkouts through the public Pool.connect(), counting the ones that time out"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except SATimeoutError:
+            with pool_stats_lock:
+                pool_stats['timeouts'] += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            # Includes the pre-ping and, when the pool has to grow, opening the new connection
+            waited = time.perf_counter() - start
+            with pool_stats_lock:
+                pool_stats['wait_total'] += waited
+                pool_stats['wait_max'] = max(pool_stats['wait_max'], waited)
+            DB_POOL_CHECKOUT_WAIT.observe(waited)
+
+@event.listens_for(Pool, 'checkout')
+def record_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    with pool_stats_lock:
+        pool_stats['checkouts'] += 1
+    DB_POOL_CHECKED_OUT.inc()
+
+@event.listens_for(Pool, 'checkin')
+def record_pool_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+@event.listens_for(Pool, 'connect')
+def record_pool_connect(dbapi_connection, connection_record):
+    with pool_stats_lock:
+        pool_stats['connects'] += 1
+    DB_POOL_CONNECTS.inc()
+
+# Keep pool log records under sqlalchemy.pool instead of the app logger
+class InstrumentedQueuePool(PoolStatsMixin, QueuePool):
+    _sqla_logger_namespace = 'sqlalchemy.pool.impl.QueuePool'
+
+class InstrumentedNullPool(PoolStatsMixin, NullPool):
+    _sqla_logger_namespace = 'sqlalchemy.pool.impl.NullPool'
+
 # PG8000-SPECIFIC DATABASE ENGINE SETTINGS
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'poolclass': NullPool,  # Disable connection pooling for pg8000 stability
-    'connect_args': {
-        'timeout': 30,  # Increased timeout for pg8000
-        'tcp_keepalive': True,
+def get_engine_options():
+    """Build engine options - pooled by default, DB_POOL_CLASS=null restores NullPool"""
+    options = {
+        'connect_args': {
+            'timeout': 30,  # Increased timeout for pg8000
+            'tcp_keepalive': True,
+        }
     }
-}
+    
+    pool_class = os.getenv('DB_POOL_CLASS', 'queue').lower()
+    if pool_class == 'null':
+        # Fallback: open a fresh connection for every checkout
+        options['poolclass'] = InstrumentedNullPool
+        app.logger.info("Using NullPool for database connections")
+        return options
+    
+    # Sized per gunicorn worker - total connections = workers * (pool_size + max_overflow)
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('true', '1', 't'),
+    })
+    app.logger.info(
+        f"Using QueuePool (size={options['pool_size']}, overflow={options['max_overflow']}, "
+        f"recycle={options['pool_recycle']}s, pre_ping={options['pool_pre_ping']})"
+    )
+    return options
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ECHO'] = os.getenv('SQLALCHEMY_ECHO', 'False').lower() == 'true'
 
@@ -113,7 +257,7 @@ class User(UserMixin, db.Model):
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
-    parent_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    parent_id = db.Column(db.Integer, db.ForeignKey('category.id'), index=True)
     children = db.relationship('Category', backref=db.backref('parent', remote_side=[id]))
     products = db.relationship('Product', backref='category', lazy=True)
 
@@ -127,16 +271,32 @@ class Product(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_scraped = db.Column(db.Boolean, default=False)
-    original_url = db.Column(db.String(500), nullable=True)
+    original_url = db.Column(db.String(500), nullable=True, unique=True, index=True)  # Upsert key for scraped products
     is_active = db.Column(db.Boolean, default=True)  # Soft deletion flag
+    
+    # Storefront listings only ever read active products - partial indexes on PostgreSQL,
+    # one per keyset sort in CATEGORY_SORTS plus the site-wide newest list
+    __table_args__ = (
+        db.Index('ix_product_active_category_created', 'category_id', 'created_at', 'id',
+                 postgresql_where=db.text('is_active')),
+        db.Index('ix_product_active_category_price', 'category_id', 'price', 'id',
+                 postgresql_where=db.text('is_active')),
+        db.Index('ix_product_active_category_name', 'category_id', db.text('lower(name)'), 'id',
+                 postgresql_where=db.text('is_active')),
+        db.Index('ix_product_active_created', 'created_at', 'id',
+                 postgresql_where=db.text('is_active')),
+    )
 
 class Cart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, default=1)
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
     product = db.relationship('Product', backref='cart_items')
+    
+    # One row per user and product - add_to_cart upserts on it
+    __table_args__ = (db.Index('uq_cart_user_product', 'user_id', 'product_id', unique=True),)
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -150,11 +310,14 @@ class Order(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='Pending')
+    
+    # Admin order list pages newest first
+    __table_args__ = (db.Index('ix_order_created_at', 'created_at', 'id'),)
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     product = db.relationship('Product')
@@ -176,18 +339,160 @@ class HeroBanner(db.Model):
 
 class CategoryImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     filename = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class HotSale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    position = db.Column(db.Integer, default=0)
+    position = db.Column(db.Integer, default=0, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     product = db.relationship('Product')
     image = db.Column(db.String(200), nullable=True)
 
+class ScrapeJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    total_items = db.Column(db.Integer, default=0)
+    processed_items = db.Column(db.Integer, default=0)
+    added = db.Column(db.Integer, default=0)
+    updated = db.Column(db.Integer, default=0)
+    unchanged = db.Column(db.Integer, default=0)
+    failed_images = db.Column(db.Integer, default=0)
+    message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    category = db.relationship('Category')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'category_id': self.category_id,
+            'status': self.status,
+            'total_items': self.total_items or 0,
+            'processed_items': self.processed_items or 0,
+            'added': self.added or 0,
+            'updated': self.updated or 0,
+            'unchanged': self.unchanged or 0,
+            'failed_images': self.failed_images or 0,
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class EmailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+class DailySales(db.Model):
+    """Per-day order totals by status and top-level category, kept current as orders change.
+
+    category_id 0 holds whole-order totals (revenue includes delivery); other rows hold the
+    line revenue and items for products under that top-level category.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    category_id = db.Column(db.Integer, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (db.Index('uq_daily_sales_day_status_category', 'day', 'status', 'category_id', unique=True),)
+
+class SchemaVersion(db.Model):
+    """Single row recording the schema version initialize_database() last completed"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(32), nullable=False)
+    initialized_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# MODEL CHANGE TRACKING FOR IN-PROCESS CACHES
+cache_invalidators = []
+
+def on_models_changed(*models):
+    """Register a callback that runs after a commit touching any of the given models"""
+    def decorator(f):
+        cache_invalidators.append((models, f))
+        return f
+    return decorator
+
+row_change_listeners = []
+
+def on_rows_changed(model):
+    """Register callback(ids) run after a commit touching rows of model.
+
+    ids is None when a bulk statement changed rows we can't enumerate.
+    """
+    def decorator(f):
+        row_change_listeners.append((model, f))
+        return f
+    return decorator
+
+def run_cache_invalidators(changed_models):
+    for models, callback in cache_invalidators:
+        if any(issubclass(changed, models) for changed in changed_models):
+            try:
+                callback()
+            except Exception as e:
+                app.logger.error(f"Cache invalidation {callback.__name__} failed: {str(e)}")
+
+def run_row_change_listeners(changed_keys):
+    for model, callback in row_change_listeners:
+        for changed, ids in changed_keys.items():
+            if issubclass(changed, model):
+                try:
+                    callback(ids)
+                except Exception as e:
+                    app.logger.error(f"Row change listener {callback.__name__} failed: {str(e)}")
+
+@event.listens_for(Session, 'after_flush')
+def track_flushed_models(session, flush_context):
+    changed = session.info.setdefault('changed_models', set())
+    keys = session.info.setdefault('changed_keys', {})
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        changed.add(type(instance))
+        # New rows have their primary key by now but no identity key until after the flush
+        primary_key = db.inspect(instance).mapper.primary_key_from_instance(instance)
+        if keys.get(type(instance), set()) is not None:
+            keys.setdefault(type(instance), set()).add(primary_key[0])
+
+@event.listens_for(Session, 'do_orm_execute')
+def track_bulk_models(orm_execute_state):
+    # Bulk insert/update/delete statements bypass the flush, so record their target model here
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            orm_execute_state.session.info.setdefault('changed_models', set()).add(mapper.class_)
+            orm_execute_state.session.info.setdefault('changed_keys', {})[mapper.class_] = None
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_caches_after_commit(session):
+    changed = session.info.pop('changed_models', None)
+    if changed:
+        run_cache_invalidators(changed)
+    changed_keys = session.info.pop('changed_keys', None)
+    if changed_keys:
+        run_row_change_listeners(changed_keys)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_tracked_models(session):
+    session.info.pop('changed_models', None)
+    session.info.pop('changed_keys', None)
+
 # ENHANCED DATABASE CONNECTION TESTING FOR PG8000
 def test_database_connection():
     """Test database connection with pg8000-specific error handling"""
@@ -289,19 +594,212 @@ def get_safe_products():
             app.logger.error(f"Second attempt failed: {str(e2)}")
             return []
 
-def get_safe_top_categories():
-    """Safely get top categories with error handling"""
+# Keep the newest row per original_url. migrations/versions/3b7c9d2e4f10 runs a frozen copy of
+# this SQL - editing it here does not change what that migration does
+DEDUPLICATE_SCRAPED_PRODUCTS_SQL = """
+    UPDATE product SET original_url = NULL, is_active = FALSE
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY original_url ORDER BY created_at DESC, id DESC
+            ) AS row_number
+            FROM product
+            WHERE original_url IS NOT NULL
+        ) ranked
+        WHERE row_number > 1
+    )
+"""
+
+# Fold duplicate cart rows into the oldest one. migrations/versions/7a2f4c9e1b63 runs a frozen copy
+# of this SQL - editing it here does not change what that migration does
+MERGE_DUPLICATE_CART_ROWS_SQL = (
+    """
+    UPDATE cart SET quantity = (
+        SELECT SUM(duplicate.quantity) FROM cart duplicate
+        WHERE duplicate.user_id = cart.user_id AND duplicate.product_id = cart.product_id
+    )
+    WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id HAVING COUNT(*) > 1)
+    """,
+    """
+    DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id)
+    """,
+)
+
+# PostgreSQL only. migrations/versions/b3e5a7c1d924 runs a frozen copy of this SQL - editing it
+# here does not change what that migration does
+PRODUCT_SEARCH_INDEX_SQL = (
+    """
+    ALTER TABLE product ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_product_search_vector ON product USING GIN (search_vector)",
+)
+PRODUCT_NAME_TRGM_INDEX_SQL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING GIN (name gin_trgm_ops)",
+)
+
+def create_product_search_indexes():
+    """Generated tsvector column + GIN index, and a trigram index for partial name matches"""
+    for statement in PRODUCT_SEARCH_INDEX_SQL:
+        db.session.execute(text(statement))
     try:
-        with db.session.no_autoflush:
-            return Category.query.filter_by(parent_id=None).all()
+        # CREATE EXTENSION needs extra privileges on some hosts - search still works without it
+        with db.session.begin_nested():
+            for statement in PRODUCT_NAME_TRGM_INDEX_SQL:
+                db.session.execute(text(statement))
     except Exception as e:
-        app.logger.error(f"Error getting top categories: {str(e)}")
-        try:
-            db.session.rollback()
-            return Category.query.filter_by(parent_id=None).all()
-        except Exception as e2:
-            app.logger.error(f"Second attempt failed: {str(e2)}")
-            return []
+        app.logger.warning(f"Trigram index for product search not created: {e}")
+
+def merge_duplicate_cart_rows():
+    """Merge duplicate (user_id, product_id) cart rows so the pair can be unique"""
+    for statement in MERGE_DUPLICATE_CART_ROWS_SQL:
+        result = db.session.execute(text(statement))
+    if result.rowcount:
+        app.logger.info(f"Merged {result.rowcount} duplicate cart rows")
+
+def create_missing_indexes():
+    """Create model-declared indexes that create_all() skips on tables that already exist"""
+    # Fresh inspector on the session connection so indexes added earlier in this migration are seen
+    inspector = db.inspect(db.session.connection())
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                # IF NOT EXISTS covers expression indexes the inspector cannot reflect on SQLite
+                db.session.execute(CreateIndex(index, if_not_exists=True))
+                created.append(index.name)
+    return created
+
+def deduplicate_scraped_products():
+    """Deactivate older duplicate scraped products so original_url can be unique"""
+    result = db.session.execute(text(DEDUPLICATE_SCRAPED_PRODUCTS_SQL))
+    if result.rowcount:
+        app.logger.info(f"Deactivated {result.rowcount} duplicate scraped products")
+
+# DAILY SALES ROLLUP
+ALL_CATEGORIES = 0  # DailySales.category_id for whole-order totals
+
+def sales_rollup_rows(day, status, total_amount, lines, sign=1):
+    """Rollup deltas for one order; lines are (category_id, quantity, line_revenue)"""
+    tree = get_category_tree()
+    rows = {ALL_CATEGORIES: {'orders': 1, 'revenue': total_amount, 'items': 0}}
+    for category_id, quantity, line_revenue in lines:
+        top_id = tree.top_level_ancestor(category_id) if category_id in tree else category_id
+        row = rows.setdefault(top_id, {'orders': 1, 'revenue': 0.0, 'items': 0})
+        row['revenue'] += line_revenue
+        row['items'] += quantity
+        rows[ALL_CATEGORIES]['items'] += quantity
+    return [
+        {
+            'day': day,
+            'status': status,
+            'category_id': category_id,
+            'orders': sign * row['orders'],
+            'revenue': sign * row['revenue'],
+            'items': sign * row['items'],
+        }
+        for category_id, row in rows.items()
+    ]
+
+def bump_sales_rollup(rows):
+    """Add deltas to the rollup with one INSERT ... ON CONFLICT DO UPDATE, in the caller's transaction"""
+    if not rows:
+        return
+    insert = dialect_insert(DailySales).values(rows)
+    excluded = insert.excluded
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=[DailySales.day, DailySales.status, DailySales.category_id],
+        set_={
+            'orders': DailySales.orders + excluded['orders'],
+            'revenue': DailySales.revenue + excluded['revenue'],
+            # excluded.items would be ColumnCollection.items()
+            'items': DailySales.items + excluded['items'],
+        }
+    ))
+
+def order_rollup_lines(order_id):
+    """(category_id, quantity, line_revenue) for a stored order, in one query"""
+    return db.session.execute(
+        db.select(Product.category_id, OrderItem.quantity, OrderItem.quantity * OrderItem.price)
+        .join(Product, OrderItem.product_id == Product.id)
+        .where(OrderItem.order_id == order_id)
+    ).all()
+
+def change_order_status(order, status):
+    """Set an order's status and move its rollup contribution along with it"""
+    if order.status == status:
+        return
+    lines = order_rollup_lines(order.id)
+    day = order.created_at.date()
+    bump_sales_rollup(
+        sales_rollup_rows(day, order.status, order.total_amount, lines, sign=-1) +
+        sales_rollup_rows(day, status, order.total_amount, lines)
+    )
+    order.status = status
+
+def rebuild_sales_rollup():
+    """Recompute every rollup row from the order tables"""
+    db.session.execute(db.delete(DailySales))
+    totals = {}
+    
+    def add(key, orders, revenue, items):
+        row = totals.setdefault(key, [0, 0.0, 0])
+        row[0] += orders
+        row[1] += revenue
+        row[2] += items
+    
+    for order_id, created_at, status, total_amount in db.session.execute(
+        db.select(Order.id, Order.created_at, Order.status, Order.total_amount)
+    ):
+        add((created_at.date(), status, ALL_CATEGORIES), 1, total_amount, 0)
+    
+    # Runs from migrate_database() at import, before the category tree index exists
+    parents = dict(db.session.execute(db.select(Category.id, Category.parent_id)).all())
+    
+    def top_level(category_id):
+        visited = set()
+        while parents.get(category_id) is not None and category_id not in visited:
+            visited.add(category_id)
+            category_id = parents[category_id]
+        return category_id
+    
+    seen = set()
+    for order_id, created_at, status, category_id, quantity, line_revenue in db.session.execute(
+        db.select(Order.id, Order.created_at, Order.status, Product.category_id,
+                  OrderItem.quantity, OrderItem.quantity * OrderItem.price)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, OrderItem.product_id == Product.id)
+    ):
+        day = created_at.date()
+        top_id = top_level(category_id)
+        # An order counts once per top-level category it touches
+        first_in_category = (order_id, top_id) not in seen
+        seen.add((order_id, top_id))
+        add((day, status, top_id), 1 if first_in_category else 0, line_revenue, quantity)
+        add((day, status, ALL_CATEGORIES), 0, 0.0, quantity)
+    
+    rows = [
+        {'day': day, 'status': status, 'category_id': category_id,
+         'orders': orders, 'revenue': revenue, 'items': items}
+        for (day, status, category_id), (orders, revenue, items) in totals.items()
+    ]
+    if rows:
+        db.session.execute(db.insert(DailySales), rows)
+    return len(rows)
+
+@app.cli.command('rebuild-sales-rollup')
+def rebuild_sales_rollup_command():
+    """Recompute the daily_sales rollup from the full order history"""
+    count = rebuild_sales_rollup()
+    if safe_commit():
+        click.echo(f"Rebuilt daily_sales with {count} rows")
+    else:
+        click.echo("Rebuilding daily_sales failed", err=True)
 
 def migrate_database():
     """Add new columns to existing tables without data loss"""
@@ -367,15 +865,50 @@ def migrate_database():
             else:
                 app.logger.info("is_active already exists in Product")
             
+            # Unique index on product.original_url - the scraper upserts on it
+            product_indexes = [index['name'] for index in inspector.get_indexes('product')]
+            if 'ix_product_original_url' not in product_indexes:
+                deduplicate_scraped_products()
+                db.session.execute(text(
+                    'CREATE UNIQUE INDEX IF NOT EXISTS ix_product_original_url ON product (original_url)'
+                ))
+                app.logger.info("Added unique index on product.original_url")
+            
+            # Unique index on cart (user_id, product_id) - add_to_cart upserts on it
+            cart_indexes = [index['name'] for index in inspector.get_indexes('cart')]
+            if 'uq_cart_user_product' not in cart_indexes:
+                merge_duplicate_cart_rows()
+                db.session.execute(text(
+                    'CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_user_product ON cart (user_id, product_id)'
+                ))
+                app.logger.info("Added unique index on cart (user_id, product_id)")
+            
+            # Secondary indexes for the hot storefront and admin queries
+            created_indexes = create_missing_indexes()
+            if created_indexes:
+                app.logger.info(f"Added indexes: {', '.join(created_indexes)}")
+            
+            # Backfill the daily sales rollup the first time it exists alongside orders
+            if not db.session.execute(db.select(DailySales.id).limit(1)).first() and \
+               db.session.execute(db.select(Order.id).limit(1)).first():
+                app.logger.info(f"Backfilled daily_sales with {rebuild_sales_rollup()} rows")
+            
+            # Full-text search column and indexes (PostgreSQL only)
+            if db.engine.dialect.name == 'postgresql' and 'search_vector' not in column_names:
+                create_product_search_indexes()
+                app.logger.info("Added product.search_vector with GIN indexes")
+            
             # Commit all changes using safe commit
             if safe_commit():
                 app.logger.info("Database migration completed successfully")
-            else:
-                app.logger.error("Database migration commit failed")
+                return True
+            app.logger.error("Database migration commit failed")
+            return False
             
         except Exception as e:
             app.logger.error(f"Database migration failed: {str(e)}")
             db.session.rollback()
+            return False
 
 def create_initial_categories():
     """Create initial categories only if they don't exist"""
@@ -409,23 +942,25 @@ def create_initial_categories():
         {'name': 'Home Security', 'children': []},
     ]
     
+    # One query for every existing category instead of two per entry
+    existing = {category.name: category for category in Category.query.all()}
     created = False
     for cat_data in categories:
-        # Check if category exists
-        parent = Category.query.filter_by(name=cat_data['name']).first()
+        parent = existing.get(cat_data['name'])
         if not parent:
             parent = Category(name=cat_data['name'])
             db.session.add(parent)
             db.session.flush()
+            existing[parent.name] = parent
             app.logger.info(f"Added category: {cat_data['name']}")
             created = True
         
         # Create subcategories
         for child_name in cat_data['children']:
-            child = Category.query.filter_by(name=child_name).first()
-            if not child:
+            if child_name not in existing:
                 child = Category(name=child_name, parent_id=parent.id)
                 db.session.add(child)
+                existing[child_name] = child
                 app.logger.info(f"Added subcategory: {child_name} under {cat_data['name']}")
                 created = True
     
@@ -450,11 +985,9 @@ def initialize_database():
                 
             db.create_all()
             
-            # Fix orphaned products immediately to prevent issues
-            fix_orphaned_products_immediate()
-            
-            # Run database migrations for schema changes
-            migrate_database()
+            # Run database migrations for schema changes (fixes orphaned products first)
+            if not migrate_database():
+                raise RuntimeError("Database migration failed")
             
             # Create admin user from environment variables
             admin_username = os.getenv('ADMIN_USERNAME')
@@ -502,11 +1035,90 @@ def initialize_database():
                 app.logger.error("All database initialization attempts failed")
                 return False
 
-# IMPROVED DATABASE INITIALIZATION WITH ERROR HANDLING
+# ONE-TIME DATABASE INITIALIZATION COORDINATED ACROSS WORKERS
+# Bump to the newest migrations/versions revision whenever initialization changes the schema
+SCHEMA_VERSION = 'f2b6d8a4c310'
+# auto: initialize at import only when the stamped version differs, always: every import,
+# never: only through `flask init-db` (e.g. a release phase)
+DB_INIT_ON_IMPORT = os.getenv('DB_INIT_ON_IMPORT', 'auto').lower()
+DB_INIT_LOCK_KEY = 4207310221  # pg_advisory_lock key shared by every worker
+
+def read_schema_version():
+    """The stamped schema version - a single-row read, None if the table is missing"""
+    try:
+        return db.session.execute(
+            db.select(SchemaVersion.version).where(SchemaVersion.id == 1)
+        ).scalar()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.info(f"Schema version not available ({type(e).__name__}) - database needs initialization")
+        return None
+
+def stamp_schema_version():
+    db.session.merge(SchemaVersion(id=1, version=SCHEMA_VERSION, initialized_at=datetime.utcnow()))
+    return safe_commit()
+
+@contextmanager
+def database_init_lock():
+    """Hold a PostgreSQL session advisory lock so one worker initializes while the rest wait"""
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as connection:
+        connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': DB_INIT_LOCK_KEY})
+        # Session-level lock - end the transaction so the connection is not left idle in it
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': DB_INIT_LOCK_KEY})
+            connection.commit()
+
+def ensure_database(force=False):
+    """Initialize the database unless it is already stamped with SCHEMA_VERSION"""
+    if not force and read_schema_version() == SCHEMA_VERSION:
+        return True
+    if not test_database_connection():
+        return False
+    # Don't sit idle in a transaction while waiting for the lock
+    db.session.rollback()
+    with database_init_lock():
+        # Another worker may have finished while this one waited for the lock
+        if not force and read_schema_version() == SCHEMA_VERSION:
+            app.logger.info("Database already initialized by another worker")
+            return True
+        if not initialize_database():
+            return False
+        return stamp_schema_version()
+
 with app.app_context():
-    success = initialize_database()
+    startup_started = time.perf_counter()
+    try:
+        if DB_INIT_ON_IMPORT == 'never':
+            current_version = read_schema_version()
+            success = current_version == SCHEMA_VERSION
+            if not success:
+                app.logger.error(f"Database schema is at {current_version or 'no version'}, expected {SCHEMA_VERSION} - run `flask init-db`")
+        else:
+            success = ensure_database(force=DB_INIT_ON_IMPORT == 'always')
+    except Exception as e:
+        app.logger.error(f"Database startup check failed: {str(e)}")
+        db.session.rollback()
+        success = False
     if not success:
         app.logger.error("Application started with database initialization failures - some features may not work")
+    app.logger.info(f"Database startup took {(time.perf_counter() - startup_started) * 1000:.0f} ms")
+    # Drop connections opened during startup so forked workers never share pooled sockets
+    db.engine.dispose()
+
+@app.cli.command('init-db')
+@click.option('--force', is_flag=True, help='Initialize even if the schema version is already current.')
+def init_db_command(force):
+    """Create tables, apply in-place migrations, seed admin and categories, then stamp SCHEMA_VERSION"""
+    started = time.perf_counter()
+    if not ensure_database(force=force):
+        raise click.ClickException("Database initialization failed - see the log")
+    click.echo(f"Database at schema {SCHEMA_VERSION} ({time.perf_counter() - started:.2f}s)")
 
 # Custom decorator for admin routes
 def admin_required(f):
@@ -527,12 +1139,211 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def get_image_url(filename):
-    """Generate full URL for an image filename with cache-busting"""
+# Content fingerprints for uploaded images, keyed by path and refreshed when the file changes
+image_versions_lock = threading.Lock()
+image_versions = {}
+
+def get_image_version(path):
+    """Short content hash of a file, hashed once per (mtime, size) and memoized"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    
+    with image_versions_lock:
+        cached = image_versions.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    version = digest.hexdigest()[:12]
+    with image_versions_lock:
+        image_versions[path] = (stat.st_mtime_ns, stat.st_size, version)
+    return version
+
+image_widths = {}
+
+def get_image_width(path):
+    """Pixel width from the image header, read once per (mtime, size); None if unreadable"""
+    if Image is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    
+    with image_versions_lock:
+        cached = image_widths.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    
+    try:
+        with Image.open(path) as image:
+            width = image.width
+    except Exception as e:
+        app.logger.error(f"Error reading image size of {path}: {e}")
+        return None
+    with image_versions_lock:
+        image_widths[path] = (stat.st_mtime_ns, stat.st_size, width)
+    return width
+
+# IMAGE DERIVATIVES (RESIZED VARIANTS + WEBP) STORED NEXT TO THE ORIGINAL
+IMAGE_VARIANTS = {
+    'thumb': 160,   # admin tables, cart rows, search suggestions
+    'card': 480,    # product grid cards
+    'hero': 1200,   # product page and hero sections
+}
+
+def image_folders():
+    """Static sub-directories that may hold an image, in lookup order"""
+    return (
+        ('uploads', app.config['UPLOAD_FOLDER']),
+        ('scraped_images', app.config['SCRAPED_IMAGES']),
+    )
+
+def variant_filename(filename, variant, ext=None):
+    """foo.jpg -> foo.card.jpg (or foo.card.webp when ext='webp')"""
+    stem, original_ext = os.path.splitext(filename)
+    if ext is None:
+        ext = 'png' if original_ext.lower() == '.gif' else original_ext.lstrip('.')
+    return f"{stem}.{variant}.{ext}"
+
+def generate_image_variants(folder, filename):
+    """Write resized and WebP variants of an image; failures only cost the optimisation"""
+    if Image is None or not filename:
+        return []
+    
+    created = []
+    try:
+        with Image.open(os.path.join(folder, filename)) as original:
+            original = ImageOps.exif_transpose(original)
+            has_alpha = original.mode in ('RGBA', 'LA', 'P')
+            source = original.convert('RGBA' if has_alpha else 'RGB')
+        
+        for variant, width in IMAGE_VARIANTS.items():
+            # thumbnail() never upscales, so small originals yield variants at their own size
+            resized = source.copy()
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+            
+            fallback = variant_filename(filename, variant)
+            if fallback.lower().endswith(('.jpg', '.jpeg')):
+                resized.convert('RGB').save(os.path.join(folder, fallback), 'JPEG', quality=82, optimize=True, progressive=True)
+            else:
+                resized.save(os.path.join(folder, fallback), 'PNG', optimize=True)
+            
+            webp = variant_filename(filename, variant, 'webp')
+            resized.save(os.path.join(folder, webp), 'WEBP', quality=80, method=4)
+            created.extend([fallback, webp])
+    except Exception as e:
+        app.logger.error(f"Error generating image variants for {filename}: {e}")
+    return created
+
+def remove_image_variants(folder, filename):
+    if not filename:
+        return
+    for variant in IMAGE_VARIANTS:
+        for name in (variant_filename(filename, variant), variant_filename(filename, variant, 'webp')):
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+def save_uploaded_image(file):
+    """Save an uploaded image into UPLOAD_FOLDER and build its variants"""
+    filename = secure_filename(file.filename)
+    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+    generate_image_variants(app.config['UPLOAD_FOLDER'], filename)
+    return filename
+
+def delete_uploaded_image(filename):
+    """Remove an uploaded image and its variants; raises like os.remove if the original is missing"""
+    remove_image_variants(app.config['UPLOAD_FOLDER'], filename)
+    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+
+@app.cli.command('generate-image-variants')
+def generate_image_variants_command():
+    """Backfill variants for images uploaded or scraped before the pipeline existed"""
+    variant_suffixes = tuple(f'.{variant}' for variant in IMAGE_VARIANTS)
+    for _, folder in image_folders():
+        for filename in sorted(os.listdir(folder)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lstrip('.').lower() not in app.config['ALLOWED_EXTENSIONS'] or stem.endswith(variant_suffixes):
+                continue
+            created = generate_image_variants(folder, filename)
+            click.echo(f"{filename}: {len(created)} variants")
+
+def find_static_image(filename):
+    """(static path, file path, content token) of the first image folder holding filename, or None"""
+    for subdir, folder in image_folders():
+        path = os.path.join(folder, filename)
+        version = get_image_version(path)
+        if version:
+            return f'{subdir}/{filename}', path, version
+    return None
+
+def versioned_static_url(filename):
+    """URL for an image in any image folder with its content token, or None if missing"""
+    found = find_static_image(filename)
+    if found:
+        return url_for('static', filename=found[0], v=found[2])
+    return None
+
+def get_image_url(filename, variant=None):
+    """Generate full URL for an image filename with a content-based cache-busting token"""
     if filename:
-        return url_for('static', filename=f'uploads/{filename}', v=datetime.now().timestamp())
+        if variant:
+            url = versioned_static_url(variant_filename(filename, variant))
+            if url:
+                return url
+        url = versioned_static_url(filename)
+        if url:
+            return url
+        return url_for('static', filename=f'uploads/{filename}')
     return None
 
+def image_srcset(filename, ext=None):
+    """'url 160w, url 480w, ...' for the variants that exist on disk, by their real pixel width.
+
+    Variants of a small original are not upscaled, so several can share one width; only the
+    first variant of each width is listed.
+    """
+    entries = []
+    widest = 0
+    for variant, target_width in sorted(IMAGE_VARIANTS.items(), key=lambda item: item[1]):
+        found = find_static_image(variant_filename(filename, variant, ext))
+        if not found:
+            continue
+        static_path, path, version = found
+        width = get_image_width(path) or target_width
+        if width <= widest:
+            continue
+        widest = width
+        entries.append(f"{url_for('static', filename=static_path, v=version)} {width}w")
+    return ', '.join(entries)
+
+def responsive_image(filename, alt='', sizes='100vw', variant='card', **attrs):
+    """<picture> with WebP and fallback srcsets; plain <img> when no variants exist"""
+    attrs.setdefault('loading', 'lazy')
+    extra = ''.join(
+        f' {escape(name.rstrip("_").replace("_", "-"))}="{escape(value)}"'
+        for name, value in attrs.items() if value is not None
+    )
+    src = get_image_url(filename, variant)
+    srcset = image_srcset(filename) if filename else ''
+    if not srcset:
+        return Markup(f'<img src="{escape(src or "")}" alt="{escape(alt)}"{extra}>')
+    
+    webp_srcset = image_srcset(filename, 'webp')
+    webp_source = f'<source type="image/webp" srcset="{escape(webp_srcset)}" sizes="{escape(sizes)}">' if webp_srcset else ''
+    return Markup(
+        f'<picture>{webp_source}'
+        f'<img src="{escape(src)}" srcset="{escape(srcset)}" sizes="{escape(sizes)}" alt="{escape(alt)}"{extra}>'
+        f'</picture>'
+    )
+
 def get_cart_count():
     if current_user.is_authenticated and not current_user.is_admin:
         return Cart.query.filter_by(user_id=current_user.id).count()
@@ -540,186 +1351,988 @@ def get_cart_count():
         return len(session['cart'])
     return 0
 
-def get_cart_total():
-    total = 0.0
+# CART PRICING
+DELIVERY_FEE = 300.0
+
+def price_cart_lines(rows):
+    """Price (line_id, product, quantity) rows in one pass; inactive or missing products are skipped"""
+    lines = []
+    subtotal = 0.0
     discounts = 0.0
+    for line_id, product, quantity in rows:
+        if not product or not product.is_active:
+            continue
+        discount = product.price * ((product.discount or 0) / 100)
+        unit_price = product.price - discount
+        lines.append(SimpleNamespace(
+            id=line_id,
+            product=product,
+            quantity=quantity,
+            unit_price=unit_price,
+            line_total=unit_price * quantity,
+        ))
+        subtotal += unit_price * quantity
+        discounts += discount * quantity
+    return SimpleNamespace(
+        lines=lines,
+        subtotal=subtotal,
+        discounts=discounts,
+        delivery=DELIVERY_FEE,
+        total=subtotal + DELIVERY_FEE,
+    )
+
+def get_cart_pricing():
+    """Line items and totals for the current cart, loaded with one query and reused for the request.
+
+    Call reset_cart_pricing() after changing the cart within the same request.
+    """
+    if 'cart_pricing' in g:
+        return g.cart_pricing
     
+    rows = []
     if current_user.is_authenticated and not current_user.is_admin:
-        cart_items = Cart.query.filter_by(user_id=current_user.id).all()
-        for item in cart_items:
-            product = db.session.get(Product, item.product_id)
-            if product and product.is_active:
-                discounted_price = product.price * (1 - (product.discount / 100))
-                total += discounted_price * item.quantity
-                discounts += (product.price * (product.discount / 100)) * item.quantity
-    elif 'cart' in session:
-        for product_id, quantity in session['cart'].items():
-            product = db.session.get(Product, int(product_id))
-            if product and product.is_active:
-                discounted_price = product.price * (1 - (product.discount / 100))
-                total += discounted_price * quantity
-                discounts += (product.price * (product.discount / 100)) * quantity
-    return total, discounts
+        rows = db.session.execute(
+            db.select(Cart.id, Product, Cart.quantity)
+            .join(Product, Cart.product_id == Product.id)
+            .options(db.joinedload(Product.category))
+            .where(Cart.user_id == current_user.id)
+            .order_by(Cart.added_at, Cart.id)
+        ).all()
+    elif session.get('cart'):
+        cart = session['cart']
+        products = {
+            product.id: product for product in Product.query.options(db.joinedload(Product.category)).filter(
+                Product.id.in_([int(product_id) for product_id in cart])
+            )
+        }
+        rows = [(int(product_id), products.get(int(product_id)), quantity) for product_id, quantity in cart.items()]
+    
+    g.cart_pricing = price_cart_lines(rows)
+    return g.cart_pricing
+
+def reset_cart_pricing():
+    g.pop('cart_pricing', None)
+
+def add_cart_item(user_id, product_id):
+    """INSERT ... ON CONFLICT DO UPDATE quantity + 1 in one round trip; returns (quantity, cart_count).
+
+    The count comes from the user's other rows plus this one, so it is the same whether
+    or not the database lets RETURNING see the row the statement just wrote.
+    """
+    other = db.aliased(Cart)
+    other_rows = db.select(db.func.count()).select_from(other).where(
+        other.user_id == user_id,
+        other.product_id != product_id
+    ).correlate(None).scalar_subquery()
+    insert = dialect_insert(Cart).values(
+        user_id=user_id,
+        product_id=product_id,
+        quantity=1,
+        added_at=datetime.utcnow()
+    )
+    statement = insert.on_conflict_do_update(
+        index_elements=[Cart.user_id, Cart.product_id],
+        set_={'quantity': Cart.quantity + 1}
+    ).returning(Cart.quantity, (other_rows + 1).label('cart_count'))
+    row = db.session.execute(statement).one()
+    return row.quantity, row.cart_count
+
+def cart_totals_json(**extra):
+    """Summary fields returned by the cart AJAX endpoints"""
+    pricing = get_cart_pricing()
+    return jsonify(dict(
+        success=True,
+        subtotal=pricing.subtotal,
+        discounts=pricing.discounts,
+        total=pricing.total,
+        **extra
+    ))
 
 def generate_order_number():
     now = datetime.now()
     return f"BRAVO-{now.strftime('%Y%m%d%H%M%S')}"
 
-def download_image(url, folder):
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            # Generate unique filename
-            ext = url.split('.')[-1].lower()
-            if ext not in app.config['ALLOWED_EXTENSIONS']:
-                ext = 'jpg'
-            filename = f"{uuid.uuid4().hex}.{ext}"
-            filepath = os.path.join(folder, filename)
-            
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            return filename
-        return None
-    except Exception as e:
-        app.logger.error(f"Error downloading image: {e}")
-        return None
-
-def send_order_email(order, order_items):
-    try:
-        subject = "New Order Received - Bravo Suppliers Ke."
-        recipients = [
-            app.config['MAIL_USERNAME'],  # Admin email
-            order.email                   # Customer email
-        ] if order.email else [app.config['MAIL_USERNAME']]
-        
-        # Calculate subtotal
-        subtotal = sum(item.quantity * item.price for item in order_items)
+# PRODUCT SEARCH
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 24))
+SEARCH_SORTS = {
+    'price_low_high': lambda: (Product.price.asc(), Product.id),
+    'price_high_low': lambda: (Product.price.desc(), Product.id),
+    'name_asc': lambda: (db.func.lower(Product.name).asc(), Product.id),
+    'name_desc': lambda: (db.func.lower(Product.name).desc(), Product.id),
+}
+search_vector_state = {'available': None}
+
+def search_vector_available():
+    """True once product.search_vector exists - PostgreSQL after migrate_database()"""
+    if search_vector_state['available'] is None:
+        search_vector_state['available'] = (
+            db.engine.dialect.name == 'postgresql'
+            and 'search_vector' in [col['name'] for col in db.inspect(db.engine).get_columns('product')]
+        )
+    return search_vector_state['available']
+
+def escape_like(value, escape='!'):
+    """Make user input literal inside a LIKE pattern"""
+    return value.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
+
+def product_search_query(query, sort_by='relevance'):
+    """SELECT for active products matching query, ordered in SQL so it can be paged with LIMIT/OFFSET.
+
+    On PostgreSQL this matches the GIN-indexed search_vector (ranked with ts_rank) or a partial
+    name match served by the trigram index; elsewhere it falls back to ILIKE.
+    """
+    pattern = f"%{escape_like(query)}%"
+    name_match = Product.name.ilike(pattern, escape='!')
+    statement = db.select(Product).where(Product.is_active == True)
+    
+    if search_vector_available():
+        search_vector = db.literal_column('product.search_vector')
+        ts_query = db.func.websearch_to_tsquery('english', query)
+        statement = statement.where(or_(search_vector.op('@@')(ts_query), name_match))
+        relevance = db.func.ts_rank(search_vector, ts_query) + db.case((name_match, 0.1), else_=0.0)
+    else:
+        statement = statement.where(or_(name_match, Product.description.ilike(pattern, escape='!')))
+        relevance = db.case((name_match, 1), else_=0)
+    
+    if sort_by in SEARCH_SORTS:
+        return statement.order_by(*SEARCH_SORTS[sort_by]())
+    return statement.order_by(relevance.desc(), Product.created_at.desc(), Product.id)
+
+# CATEGORY LISTINGS (KEYSET PAGINATION)
+CATEGORY_PAGE_SIZE = int(os.getenv('CATEGORY_PAGE_SIZE', 24))
+CATEGORY_COUNT_TTL = int(os.getenv('CATEGORY_COUNT_TTL', 300))
+
+# Sort key column and direction; ties are broken by id in the same direction so (key, id) is unique
+CATEGORY_SORTS = {
+    'newest': (lambda entity: entity.created_at, True),
+    'price_low_high': (lambda entity: entity.price, False),
+    'price_high_low': (lambda entity: entity.price, True),
+    'name_asc': (lambda entity: db.func.lower(entity.name), False),
+    'discount': (lambda entity: db.func.coalesce(entity.discount, 0.0), True),
+}
+category_count_lock = threading.Lock()
+category_count_cache = {}
+
+def get_category_product_count(category_id, category_ids):
+    """Active product count for a category subtree, cached per category"""
+    with category_count_lock:
+        cached = category_count_cache.get(category_id)
+        hit = bool(cached) and time.monotonic() < cached[1]
+    record_cache_lookup('category_count', hit)
+    if hit:
+        return cached[0]
+    count = db.session.execute(
+        db.select(db.func.count(Product.id)).where(
+            Product.category_id.in_(category_ids),
+            Product.is_active == True
+        )
+    ).scalar()
+    with category_count_lock:
+        # TTL bounds staleness for changes committed by other workers
+        category_count_cache[category_id] = (count, time.monotonic() + CATEGORY_COUNT_TTL)
+    return count
+
+@on_models_changed(Product, Category)
+def invalidate_category_counts():
+    with category_count_lock:
+        category_count_cache.clear()
+
+def get_category_page(category_ids, sort_by='newest', after=None, before=None, per_page=CATEGORY_PAGE_SIZE):
+    """One page of active products ordered in SQL, continuing after (or before) a product id.
+
+    The cursor compares (sort key, id) against the cursor product's own row, so deep pages
+    cost the same as the first one. Returns (products, has_next, has_prev).
+    """
+    key_column, descending = CATEGORY_SORTS.get(sort_by, CATEGORY_SORTS['newest'])
+    key = key_column(Product)
+    cursor_id = before if before is not None else after
+    backwards = before is not None
+    # Walking backwards flips the direction, then the page is reversed
+    forward_desc = descending != backwards
+    
+    statement = db.select(Product).where(
+        Product.category_id.in_(category_ids),
+        Product.is_active == True
+    )
+    if cursor_id is not None:
+        cursor = db.aliased(Product)
+        cursor_key = db.select(key_column(cursor)).where(cursor.id == cursor_id).scalar_subquery()
+        cursor_row = db.tuple_(cursor_key, db.literal(cursor_id))
+        if forward_desc:
+            statement = statement.where(db.tuple_(key, Product.id) < cursor_row)
+        else:
+            statement = statement.where(db.tuple_(key, Product.id) > cursor_row)
+    if forward_desc:
+        statement = statement.order_by(key.desc(), Product.id.desc())
+    else:
+        statement = statement.order_by(key.asc(), Product.id.asc())
+    
+    products = db.session.execute(statement.limit(per_page + 1)).scalars().all()
+    has_more = len(products) > per_page
+    products = products[:per_page]
+    if backwards:
+        products.reverse()
+        return products, True, has_more
+    return products, has_more, cursor_id is not None
+
+# IN-MEMORY AUTOCOMPLETE INDEX OVER ACTIVE PRODUCT NAMES
+SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', 8))
+SUGGEST_SCAN_LIMIT = int(os.getenv('SUGGEST_SCAN_LIMIT', 500))
+SUGGEST_INDEX_TTL = int(os.getenv('SUGGEST_INDEX_TTL', 300))
+
+def suggestion_tokens(text_value):
+    return [token for token in ''.join(ch if ch.isalnum() else ' ' for ch in text_value.lower()).split() if token]
+
+class ProductSuggestionIndex:
+    """Sorted (word, name, id) array over active products; lookups are a bisect plus a short scan.
+
+    Every word of a name is indexed, so "sho" finds "Red Shoes". Rows are patched in place
+    when products change in this worker; a TTL rebuild picks up changes from other workers.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.keys = []
+        self.pending_ids = set()
+        self.expires = 0.0
+        self.refreshing = False
+    
+    def _add(self, entry):
+        self.entries[entry['id']] = entry
+        for token in set(suggestion_tokens(entry['name'])):
+            bisect.insort(self.keys, (token, entry['name'].lower(), entry['id']))
+    
+    def _remove(self, product_id):
+        entry = self.entries.pop(product_id, None)
+        if entry:
+            for token in set(suggestion_tokens(entry['name'])):
+                key = (token, entry['name'].lower(), product_id)
+                position = bisect.bisect_left(self.keys, key)
+                if position < len(self.keys) and self.keys[position] == key:
+                    del self.keys[position]
+    
+    @staticmethod
+    def _load(product_ids=None):
+        statement = db.select(
+            Product.id, Product.name, Product.price, Product.discount, Product.image
+        ).where(Product.is_active == True)
+        if product_ids is not None:
+            statement = statement.where(Product.id.in_(product_ids))
+        return [row._asdict() for row in db.session.execute(statement)]
+    
+    def refresh(self):
+        """Full rebuild after the TTL, otherwise apply pending per-product changes.
+
+        Only one thread refreshes at a time; concurrent callers keep serving the current index.
+        """
+        with self.lock:
+            rebuild = time.monotonic() >= self.expires
+            pending = set(self.pending_ids)
+            if self.refreshing or (not rebuild and not pending):
+                return
+            self.refreshing = True
+            if rebuild:
+                # A mark_changed(None) during the rebuild resets this and forces another one
+                self.expires = float('inf')
         
-        body = f"""
-        <h2>New Order #{order.order_number}</h2>
-        <p><strong>Customer:</strong> {order.first_name} {order.last_name}</p>
-        <p><strong>Phone:</strong> {order.phone}</p>
-        <p><strong>Email:</strong> {order.email or 'N/A'}</p>
-        <p><strong>Delivery Address:</strong> {order.address}</p>
-        <p><strong>Notes:</strong> {order.notes or 'None'}</p>
+        try:
+            rows = self._load(None if rebuild else pending)
+            if rebuild:
+                # Build the new arrays outside the lock so lookups aren't blocked by the sort
+                entries, keys = {}, []
+                for row in rows:
+                    entries[row['id']] = row
+                    for token in set(suggestion_tokens(row['name'])):
+                        keys.append((token, row['name'].lower(), row['id']))
+                keys.sort()
+            with self.lock:
+                if rebuild:
+                    self.entries, self.keys = entries, keys
+                    if self.expires == float('inf'):
+                        self.expires = time.monotonic() + SUGGEST_INDEX_TTL
+                else:
+                    # Deactivated or deleted products simply don't come back from _load
+                    for product_id in pending:
+                        self._remove(product_id)
+                    for row in rows:
+                        self._add(row)
+                self.pending_ids -= pending
+        finally:
+            with self.lock:
+                self.refreshing = False
+                if self.expires == float('inf'):
+                    self.expires = 0.0
+    
+    def mark_changed(self, product_ids):
+        with self.lock:
+            if product_ids is None:
+                self.expires = 0.0
+            else:
+                self.pending_ids.update(product_ids)
+    
+    def lookup(self, query, limit=SUGGEST_LIMIT):
+        tokens = suggestion_tokens(query)
+        if not tokens:
+            return []
+        first, rest = tokens[0], tokens[1:]
+        phrase = ' '.join(tokens)
         
-        <h3>Order Summary</h3>
-        <table style="width: 100%; border-collapse: collapse;">
-            <tr style="background-color: #f2f2f2;">
-                <th style="padding: 8px; border: 1px solid #ddd;">Product</th>
-                <th style="padding: 8px; border: 1px solid #ddd;">Qty</th>
-                <th style="padding: 8px; border: 1px solid #ddd;">Price</th>
-                <th style="padding: 8px; border: 1px solid #ddd;">Subtotal</th>
-            </tr>
-            {"".join(
-                f'<tr><td style="padding: 8px; border: 1px solid #ddd;">{item.product.name}</td>'
-                f'<td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{item.quantity}</td>'
-                f'<td style="padding: 8px; border: 1px solid #ddd; text-align: right;">KSh {item.price:.2f}</td>'
-                f'<td style="padding: 8px; border: 1px solid #ddd; text-align: right;">KSh {item.quantity * item.price:.2f}</td></tr>'
-                for item in order_items
-            )}
-        </table>
+        candidates = {}
+        with self.lock:
+            position = bisect.bisect_left(self.keys, (first,))
+            while position < len(self.keys) and len(candidates) < SUGGEST_SCAN_LIMIT:
+                token, _, product_id = self.keys[position]
+                if not token.startswith(first):
+                    break
+                candidates[product_id] = self.entries[product_id]
+                position += 1
         
-        <p><strong>Subtotal:</strong> KSh {subtotal:.2f}</p>
-        <p><strong>Delivery Fee:</strong> KSh 300.00</p>
-        <p><strong>Total Amount:</strong> KSh {order.total_amount:.2f}</p>
+        matches = []
+        for entry in candidates.values():
+            words = suggestion_tokens(entry['name'])
+            if all(any(word.startswith(token) for word in words) for token in rest):
+                # Names that start with the query first, then shorter names
+                matches.append((not ' '.join(words).startswith(phrase), len(entry['name']), entry['name'].lower(), entry))
+        matches.sort(key=lambda match: match[:3])
+        return [match[3] for match in matches[:limit]]
+
+product_suggestions = ProductSuggestionIndex()
+
+@on_rows_changed(Product)
+def update_product_suggestions(product_ids):
+    product_suggestions.mark_changed(product_ids)
+
+# SHARED HTTP CLIENT FOR SCRAPING
+SCRAPE_MAX_WORKERS = int(os.getenv('SCRAPE_MAX_WORKERS', 8))
+SCRAPE_PER_HOST_LIMIT = int(os.getenv('SCRAPE_PER_HOST_LIMIT', 4))
+SCRAPE_CONNECT_TIMEOUT = float(os.getenv('SCRAPE_CONNECT_TIMEOUT', 5))
+SCRAPE_READ_TIMEOUT = float(os.getenv('SCRAPE_READ_TIMEOUT', 20))
+
+# One keep-alive session so repeated fetches from a host reuse TCP/TLS connections
+http_session = requests.Session()
+http_session.headers['User-Agent'] = 'BravoSuppliersScraper/1.0'
+http_adapter = HTTPAdapter(pool_connections=SCRAPE_MAX_WORKERS, pool_maxsize=SCRAPE_MAX_WORKERS)
+http_session.mount('http://', http_adapter)
+http_session.mount('https://', http_adapter)
+
+host_semaphores_lock = threading.Lock()
+host_semaphores = {}
+
+def host_semaphore(url):
+    """Per-host concurrency limit shared by all scrape downloads in this worker"""
+    host = urlparse(url).netloc.lower()
+    with host_semaphores_lock:
+        if host not in host_semaphores:
+            host_semaphores[host] = threading.BoundedSemaphore(SCRAPE_PER_HOST_LIMIT)
+        return host_semaphores[host]
+
+SCRAPE_MAX_IMAGE_BYTES = int(os.getenv('SCRAPE_MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+SCRAPE_CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the image formats we accept, mapped to the extension we store
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+def sniff_image_extension(head):
+    """Extension for the image type identified by its magic bytes, or None"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+def download_image(url, folder):
+    """Stream an image to a temp file under a size cap, then rename it into place.
+
+    The stored extension comes from the file's magic bytes, not the URL.
+    """
+    tmp_path = None
+    try:
+        with host_semaphore(url):
+            with http_session.get(url, timeout=(SCRAPE_CONNECT_TIMEOUT, SCRAPE_READ_TIMEOUT), stream=True) as response:
+                if response.status_code != 200:
+                    return None
+                
+                declared = response.headers.get('Content-Length')
+                if declared and declared.isdigit() and int(declared) > SCRAPE_MAX_IMAGE_BYTES:
+                    app.logger.warning(f"Skipping {url}: {declared} bytes exceeds the {SCRAPE_MAX_IMAGE_BYTES} byte limit")
+                    return None
+                
+                fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.download-', suffix='.part')
+                head = b''
+                size = 0
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=SCRAPE_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > SCRAPE_MAX_IMAGE_BYTES:
+                            app.logger.warning(f"Skipping {url}: larger than {SCRAPE_MAX_IMAGE_BYTES} bytes")
+                            return None
+                        if len(head) < 16:
+                            head += chunk[:16 - len(head)]
+                        f.write(chunk)
         
-        <p>Thank you for choosing Bravo Shoppers Ke.!</p>
-        """
+        ext = sniff_image_extension(head)
+        if not ext:
+            app.logger.warning(f"Skipping {url}: not a JPEG, PNG or GIF image")
+            return None
         
-        msg = Message(
-            subject=subject,
-            recipients=recipients,
-            html=body,
-            sender=app.config['MAIL_DEFAULT_SENDER']  # Explicit sender
-        )
-        mail.send(msg)
-        return True
+        # Generate unique filename
+        filename = f"{uuid.uuid4().hex}.{ext}"
+        os.replace(tmp_path, os.path.join(folder, filename))
+        tmp_path = None
+        generate_image_variants(folder, filename)
+        return filename
     except Exception as e:
-        app.logger.error(f"Email sending failed: {str(e)}")
-        return False
+        app.logger.error(f"Error downloading image: {e}")
+        return None
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def download_images(urls, folder, on_progress=None):
+    """Download images concurrently; returns one {url, filename, seconds} report per URL, in order.
+
+    on_progress(done, total) is called from the calling thread as downloads finish.
+    """
+    def fetch(url):
+        start = time.perf_counter()
+        filename = download_image(url, folder)
+        return {'url': url, 'filename': filename, 'seconds': time.perf_counter() - start}
+    
+    if not urls:
+        return []
+    reports = [None] * len(urls)
+    with ThreadPoolExecutor(max_workers=min(SCRAPE_MAX_WORKERS, len(urls))) as executor:
+        futures = {executor.submit(fetch, url): index for index, url in enumerate(urls)}
+        for done, future in enumerate(as_completed(futures), 1):
+            reports[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done, len(urls))
+    
+    for report in reports:
+        status = 'ok' if report['filename'] else 'failed'
+        app.logger.info(f"Image fetch {status} in {report['seconds']:.2f}s: {report['url']}")
+    return reports
+
+SCRAPE_UPSERT_BATCH = int(os.getenv('SCRAPE_UPSERT_BATCH', 500))
+
+def dialect_insert(model):
+    """INSERT construct with on_conflict_do_update() for the active database"""
+    if db.engine.dialect.name == 'sqlite':
+        return sqlite_insert(model)
+    return pg_insert(model)
+
+def upsert_scraped_products(rows):
+    """INSERT ... ON CONFLICT (original_url) DO UPDATE, one statement per batch.
+
+    Existing rows keep their image when the incoming row has none and
+    are only rewritten when name, price or category differ or they have
+    no image yet.
+    """
+    for start in range(0, len(rows), SCRAPE_UPSERT_BATCH):
+        stmt = dialect_insert(Product).values(rows[start:start + SCRAPE_UPSERT_BATCH])
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.original_url],
+            set_={
+                'name': excluded.name,
+                'price': excluded.price,
+                'category_id': excluded.category_id,
+                'is_scraped': True,
+                'image': db.func.coalesce(excluded.image, Product.image),
+            },
+            where=or_(
+                Product.name != excluded.name,
+                Product.price != excluded.price,
+                Product.category_id != excluded.category_id,
+                Product.image.is_(None),
+            )
+        )
+        db.session.execute(stmt)
+
+# EMAIL OUTBOX
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 20))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_BACKOFF_BASE = int(os.getenv('OUTBOX_BACKOFF_BASE', 30))  # Seconds, doubled per attempt
+OUTBOX_BACKOFF_MAX = int(os.getenv('OUTBOX_BACKOFF_MAX', 3600))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', 5))
+
+def queue_email(subject, recipients, html):
+    """Add an email to the outbox in the caller's transaction; the send-outbox worker delivers it"""
+    recipients = [recipient for recipient in recipients if recipient]
+    if not recipients:
+        # Nothing could ever deliver it - don't leave it retrying until OUTBOX_MAX_ATTEMPTS
+        app.logger.warning(f"Not queueing email '{subject}': no recipients (is MAIL_USERNAME set?)")
+        return
+    db.session.add(EmailOutbox(
+        subject=subject,
+        recipients=json.dumps(recipients),
+        html=html,
+    ))
+
+def queue_order_email(order, order_items):
+    """Queue the order notification for the admin and, if given, the customer.
+
+    order_items need .product.name, .quantity and .price.
+    """
+    subject = "New Order Received - Bravo Suppliers Ke."
+    recipients = [
+        app.config['MAIL_USERNAME'],  # Admin email
+        order.email                   # Customer email
+    ] if order.email else [app.config['MAIL_USERNAME']]
+    
+    # Calculate subtotal
+    subtotal = sum(item.quantity * item.price for item in order_items)
+    
+    body = f"""
+    <h2>New Order #{order.order_number}</h2>
+    <p><strong>Customer:</strong> {order.first_name} {order.last_name}</p>
+    <p><strong>Phone:</strong> {order.phone}</p>
+    <p><strong>Email:</strong> {order.email or 'N/A'}</p>
+    <p><strong>Delivery Address:</strong> {order.address}</p>
+    <p><strong>Notes:</strong> {order.notes or 'None'}</p>
+    
+    <h3>Order Summary</h3>
+    <table style="width: 100%; border-collapse: collapse;">
+        <tr style="background-color: #f2f2f2;">
+            <th style="padding: 8px; border: 1px solid #ddd;">Product</th>
+            <th style="padding: 8px; border: 1px solid #ddd;">Qty</th>
+            <th style="padding: 8px; border: 1px solid #ddd;">Price</th>
+            <th style="padding: 8px; border: 1px solid #ddd;">Subtotal</th>
+        </tr>
+        {"".join(
+            f'<tr><td style="padding: 8px; border: 1px solid #ddd;">{item.product.name}</td>'
+            f'<td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{item.quantity}</td>'
+            f'<td style="padding: 8px; border: 1px solid #ddd; text-align: right;">KSh {item.price:.2f}</td>'
+            f'<td style="padding: 8px; border: 1px solid #ddd; text-align: right;">KSh {item.quantity * item.price:.2f}</td></tr>'
+            for item in order_items
+        )}
+    </table>
+    
+    <p><strong>Subtotal:</strong> KSh {subtotal:.2f}</p>
+    <p><strong>Delivery Fee:</strong> KSh 300.00</p>
+    <p><strong>Total Amount:</strong> KSh {order.total_amount:.2f}</p>
+    
+    <p>Thank you for choosing Bravo Shoppers Ke.!</p>
+    """
+    
+    queue_email(subject, recipients, body)
+
+def outbox_backoff(attempts):
+    return timedelta(seconds=min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX))
+
+def deliver_outbox_batch(connection):
+    """Send one batch of due emails over an open SMTP connection; returns how many were attempted.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED so several workers never send the same email.
+    Raises SMTPServerDisconnected after recording the failure so the caller can reconnect.
+    """
+    now = datetime.utcnow()
+    emails = db.session.execute(
+        db.select(EmailOutbox)
+        .where(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    
+    disconnected = None
+    for email in emails:
+        if disconnected:
+            break
+        try:
+            connection.send(Message(
+                subject=email.subject,
+                recipients=json.loads(email.recipients),
+                html=email.html,
+                sender=app.config['MAIL_DEFAULT_SENDER']  # Explicit sender
+            ))
+            email.status = 'sent'
+            email.sent_at = datetime.utcnow()
+            email.last_error = None
+        except Exception as e:
+            email.attempts = (email.attempts or 0) + 1
+            email.last_error = str(e)
+            if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+                email.status = 'failed'
+                app.logger.error(f"Giving up on outbox email {email.id} after {email.attempts} attempts: {e}")
+            else:
+                email.next_attempt_at = datetime.utcnow() + outbox_backoff(email.attempts)
+                app.logger.warning(f"Outbox email {email.id} attempt {email.attempts} failed: {e}")
+            if isinstance(e, smtplib.SMTPServerDisconnected):
+                disconnected = e
+    
+    if not safe_commit():
+        raise RuntimeError('Could not record outbox delivery results')
+    if disconnected:
+        raise disconnected
+    return len(emails)
+
+def has_due_outbox_emails():
+    return db.session.execute(
+        db.select(EmailOutbox.id)
+        .where(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= datetime.utcnow())
+        .limit(1)
+    ).first() is not None
+
+def drain_outbox():
+    """Deliver every due email, reusing one SMTP connection until the outbox is empty"""
+    sent_batches = 0
+    while has_due_outbox_emails():
+        batches_before = sent_batches
+        try:
+            with mail.connect() as connection:
+                while deliver_outbox_batch(connection):
+                    sent_batches += 1
+        except (smtplib.SMTPException, OSError) as e:
+            # Connection-level failure - failed rows were already rescheduled, back off before retrying
+            app.logger.error(f"SMTP connection error in outbox worker: {e}")
+            db.session.rollback()
+            break
+        if sent_batches == batches_before:
+            # Everything due is locked by another worker - leave it to them rather than spin
+            break
+    db.session.remove()
+    return sent_batches
+
+@app.cli.command('send-outbox')
+@click.option('--once', is_flag=True, help='Deliver whatever is due and exit.')
+def send_outbox_command(once):
+    """Run the email outbox worker"""
+    app.logger.info("Email outbox worker started")
+    while True:
+        try:
+            drain_outbox()
+        except Exception as e:
+            app.logger.error(f"Email outbox worker error: {e}")
+            db.session.rollback()
+        if once:
+            break
+        time.sleep(OUTBOX_POLL_INTERVAL)
 
 def get_hot_sale_image(hot_sale):
     # Return no-image if product is inactive
     if not hot_sale.product or not hot_sale.product.is_active:
-        return url_for('static', filename='images/no-image.png', _external=True)
+        return url_for('static', filename='images/no-image.png')
     if hot_sale.image:
-        return get_image_url(hot_sale.image)
+        return get_image_url(hot_sale.image, 'card')
     elif hot_sale.product and hot_sale.product.image:
-        return get_image_url(hot_sale.product.image)
-    return url_for('static', filename='images/no-image.png', _external=True)
+        return get_image_url(hot_sale.product.image, 'card')
+    return url_for('static', filename='images/no-image.png')
+
+# IN-MEMORY CATEGORY TREE INDEX
+class CategoryTree:
+    """Read-only snapshot of the category hierarchy with precomputed lookups"""
+
+    def __init__(self, rows):
+        self.names = {}
+        self.parents = {}
+        self.children = {None: []}
+        for category_id, name, parent_id in rows:
+            self.names[category_id] = name
+            self.parents[category_id] = parent_id
+            self.children.setdefault(category_id, [])
+        for category_id, parent_id in self.parents.items():
+            # Treat categories pointing at a missing parent as top-level
+            if parent_id not in self.names:
+                parent_id = None
+                self.parents[category_id] = None
+            self.children.setdefault(parent_id, []).append(category_id)
+        
+        self.depth = {}
+        self.ancestors = {}
+        self.descendants = {}
+        self.order = []
+        
+        # Depth-first walk from the roots; also yields the admin display order
+        def walk(category_id, depth, ancestors):
+            self.order.append(category_id)
+            self.depth[category_id] = depth
+            self.ancestors[category_id] = ancestors
+            below = set()
+            for child_id in self.children[category_id]:
+                below.add(child_id)
+                below |= walk(child_id, depth + 1, ancestors | {category_id})
+            self.descendants[category_id] = frozenset(below)
+            return below
+        
+        for root_id in self.children[None]:
+            walk(root_id, 0, frozenset())
+
+    def __contains__(self, category_id):
+        return category_id in self.names
+
+    def top_level_ids(self):
+        return list(self.children[None])
+
+    def subtree_ids(self, category_id):
+        """The category itself plus every category below it"""
+        return self.descendants.get(category_id, frozenset()) | {category_id}
+
+    def top_level_ancestor(self, category_id):
+        ancestors = self.ancestors.get(category_id)
+        if not ancestors:
+            return category_id
+        return next(a for a in ancestors if self.parents[a] is None)
+
+    def node(self, category_id):
+        """Lightweight stand-in for a Category row, safe to use outside a session"""
+        return SimpleNamespace(
+            id=category_id,
+            name=self.names[category_id],
+            parent_id=self.parents[category_id],
+            children=[SimpleNamespace(id=child_id, name=self.names[child_id])
+                      for child_id in self.children[category_id]]
+        )
+
+    def hierarchical(self):
+        """(id, name, depth) tuples in tree order, as used by the admin selects"""
+        return [(category_id, self.names[category_id], self.depth[category_id])
+                for category_id in self.order]
+
+CATEGORY_TREE_TTL = int(os.getenv('CATEGORY_TREE_TTL', 300))
+category_tree_lock = threading.Lock()
+category_tree_cache = {'tree': None, 'expires': 0.0}
+
+def get_category_tree():
+    """Return the cached category tree, building it with a single query when needed"""
+    with category_tree_lock:
+        tree = category_tree_cache['tree']
+        hit = tree is not None and time.monotonic() < category_tree_cache['expires']
+    record_cache_lookup('category_tree', hit)
+    if hit:
+        return tree
+    
+    rows = db.session.execute(
+        db.select(Category.id, Category.name, Category.parent_id).order_by(Category.id)
+    ).all()
+    tree = CategoryTree(rows)
+    with category_tree_lock:
+        category_tree_cache['tree'] = tree
+        # TTL bounds staleness for changes committed by other workers
+        category_tree_cache['expires'] = time.monotonic() + CATEGORY_TREE_TTL
+    return tree
+
+@on_models_changed(Category)
+def invalidate_category_tree():
+    with category_tree_lock:
+        category_tree_cache['tree'] = None
+        category_tree_cache['expires'] = 0.0
 
 def get_hierarchical_categories():
     """Get categories in hierarchical order with depth information"""
-    all_categories = Category.query.all()
-    
-    # Create a mapping of parent IDs to children
-    children_map = {}
-    for category in all_categories:
-        if category.parent_id not in children_map:
-            children_map[category.parent_id] = []
-        children_map[category.parent_id].append(category)
-    
-    # Recursive function to build the hierarchy
-    def build_tree(parent_id, depth=0):
-        categories = []
-        if parent_id in children_map:
-            for child in children_map[parent_id]:
-                categories.append((child.id, child.name, depth))
-                # Add children recursively
-                categories.extend(build_tree(child.id, depth + 1))
-        return categories
-    
-    # Start with top-level categories (parent_id = None)
-    return build_tree(None)
+    return get_category_tree().hierarchical()
+
+# NAVIGATION / HERO CACHE SHARED BY ALL TEMPLATES
+NAV_CACHE_TTL = int(os.getenv('NAV_CACHE_TTL', 300))
+nav_cache_lock = threading.Lock()
+nav_cache = {'data': None, 'expires': 0.0}
+
+def build_navigation_data():
+    """Load navigation categories, hero sections and category images as detached snapshots"""
+    # Plain objects so cached data never touches a (closed) session
+    tree = get_category_tree()
+    top_categories = [tree.node(category_id) for category_id in tree.top_level_ids()]
+    
+    hero_middle = HeroMiddle.query.filter_by(is_active=True).first()
+    # Skip hero middle if missing critical fields
+    if hero_middle and (not hero_middle.image or not hero_middle.title or not hero_middle.description):
+        hero_middle = None
+    if hero_middle:
+        hero_middle = SimpleNamespace(
+            id=hero_middle.id,
+            title=hero_middle.title,
+            description=hero_middle.description,
+            image=hero_middle.image,
+            discount_percentage=hero_middle.discount_percentage or 0.0
+        )
+    
+    hero_banner = HeroBanner.query.filter_by(is_active=True).first()
+    # Skip hero banner if no image
+    if hero_banner and not hero_banner.image:
+        hero_banner = None
+    if hero_banner:
+        hero_banner = SimpleNamespace(id=hero_banner.id, image=hero_banner.image)
+    
+    # First image for each top category in a single query
+    category_hero_images = {}
+    top_ids = [category.id for category in top_categories]
+    if top_ids:
+        images = CategoryImage.query.filter(
+            CategoryImage.category_id.in_(top_ids)
+        ).order_by(CategoryImage.id).all()
+        for image in images:
+            if image.category_id not in category_hero_images:
+                category_hero_images[image.category_id] = get_image_url(image.filename)
+    
+    return dict(
+        top_categories=top_categories,
+        hero_middle=hero_middle,
+        hero_banner=hero_banner,
+        category_hero_images=category_hero_images
+    )
+
+def get_navigation_data():
+    """Return cached navigation data, rebuilding it when the TTL has expired"""
+    with nav_cache_lock:
+        data = nav_cache['data']
+        hit = data is not None and time.monotonic() < nav_cache['expires']
+    record_cache_lookup('navigation', hit)
+    if hit:
+        return data
+    
+    data = build_navigation_data()
+    with nav_cache_lock:
+        nav_cache['data'] = data
+        nav_cache['expires'] = time.monotonic() + NAV_CACHE_TTL
+    return data
+
+@on_models_changed(Category, HeroMiddle, HeroBanner, CategoryImage)
+def invalidate_navigation_cache():
+    with nav_cache_lock:
+        nav_cache['data'] = None
+        nav_cache['expires'] = 0.0
+
+def get_latest_products_by_top_category(limit=8):
+    """Newest active products for every top-level category section in a single query.
+
+    A recursive CTE maps each category to its top-level ancestor and
+    ROW_NUMBER() keeps the newest `limit` products per ancestor.
+    Returns {top_category_id: [Product, ...]}.
+    """
+    roots = db.select(
+        Category.id.label('id'), Category.id.label('root_id')
+    ).where(Category.parent_id.is_(None)).cte('category_roots', recursive=True)
+    child = db.aliased(Category)
+    roots = roots.union_all(
+        db.select(child.id, roots.c.root_id).join(roots, child.parent_id == roots.c.id)
+    )
+    
+    ranked = db.select(
+        Product.id.label('product_id'),
+        roots.c.root_id,
+        db.func.row_number().over(
+            partition_by=roots.c.root_id,
+            order_by=(Product.created_at.desc(), Product.id.desc())
+        ).label('row_number')
+    ).join(roots, Product.category_id == roots.c.id).where(
+        Product.is_active == True
+    ).subquery()
+    
+    rows = db.session.execute(
+        db.select(Product, ranked.c.root_id)
+        .join(ranked, Product.id == ranked.c.product_id)
+        .where(ranked.c.row_number <= limit)
+        .order_by(ranked.c.root_id, ranked.c.row_number)
+    ).all()
+    
+    products_by_root = {}
+    for product, root_id in rows:
+        products_by_root.setdefault(root_id, []).append(product)
+    return products_by_root
+
+# ANONYMOUS FULL-PAGE CACHE FOR STOREFRONT PAGES
+# Each worker has its own cache and admin edits only clear the worker that handled them, so
+# other workers can serve the old page (and its ETag) for up to PAGE_CACHE_TTL seconds
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 120))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', 500))
+page_cache_lock = threading.Lock()
+page_cache = OrderedDict()
+
+def page_is_cacheable():
+    """Only anonymous GETs without pending flash messages share cached pages"""
+    return (
+        request.method == 'GET'
+        and not current_user.is_authenticated
+        and '_flashes' not in session
+    )
+
+def build_cached_response(entry):
+    response = make_response(entry['body'], 200)
+    response.mimetype = entry['mimetype']
+    response.set_etag(entry['etag'])
+    # Browsers must revalidate, which costs a 304 while the page is unchanged
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+def cached_page(*query_args):
+    """Serve anonymous storefront pages from an in-process cache with strong ETags.
+
+    query_args names the query parameters the view reads; any others stay out of the cache key
+    so made-up ?x=... values can't churn the cache.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not page_is_cacheable():
+                return f(*args, **kwargs)
+            
+            # Host is part of the key so a forged Host header can't leak into other visitors' pages
+            key = (
+                request.host,
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(request.args.get(name) for name in query_args),
+            )
+            now = time.monotonic()
+            with page_cache_lock:
+                entry = page_cache.get(key)
+                if entry and entry['expires'] > now:
+                    page_cache.move_to_end(key)
+                else:
+                    entry = None
+            record_cache_lookup('page', entry is not None)
+            if entry:
+                return build_cached_response(entry)
+            
+            # Render without per-visitor data; the cart badge is filled in by main.js
+            g.rendering_cached_page = True
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough or g.get('skip_page_cache'):
+                return response
+            
+            body = response.get_data()
+            entry = {
+                'body': body,
+                'mimetype': response.mimetype,
+                'etag': hashlib.sha256(body).hexdigest(),
+                'expires': now + PAGE_CACHE_TTL,
+            }
+            with page_cache_lock:
+                page_cache[key] = entry
+                page_cache.move_to_end(key)
+                while len(page_cache) > PAGE_CACHE_MAX_ENTRIES:
+                    page_cache.popitem(last=False)
+            return build_cached_response(entry)
+        return decorated_function
+    return decorator
+
+@on_models_changed(Product, Category, HeroMiddle, HeroBanner, CategoryImage, HotSale)
+def invalidate_page_cache():
+    with page_cache_lock:
+        page_cache.clear()
 
 # Context processor to make common data available in all templates
 @app.context_processor
 def inject_common_data():
     try:
-        # Get top-level categories safely
-        top_categories = get_safe_top_categories()
-        
-        # For each top category, get its direct children
-        for category in top_categories:
-            try:
-                category.children = Category.query.filter_by(parent_id=category.id).all()
-            except Exception as e:
-                app.logger.error(f"Error getting children for category {category.id}: {str(e)}")
-                category.children = []
-        
-        current_year = datetime.now().year
-        cart_count = get_cart_count()
-        
-        # Get hero section data with fallbacks
-        hero_middle = HeroMiddle.query.filter_by(is_active=True).first()
-        # Skip hero middle if missing critical fields
-        if hero_middle and (not hero_middle.image or not hero_middle.title or not hero_middle.description):
-            hero_middle = None
-        
-        hero_banner = HeroBanner.query.filter_by(is_active=True).first()
-        # Skip hero banner if no image
-        if hero_banner and not hero_banner.image:
-            hero_banner = None
-        
-        # Get first image for each category
-        category_hero_images = {}
-        for category in top_categories:
-            try:
-                image = CategoryImage.query.filter_by(category_id=category.id).first()
-                if image:
-                    category_hero_images[category.id] = get_image_url(image.filename)
-            except Exception as e:
-                app.logger.error(f"Error getting category image for {category.id}: {str(e)}")
+        navigation = get_navigation_data()
         
         return dict(
-            top_categories=top_categories,
-            current_year=current_year,
-            cart_count=cart_count,
-            hero_middle=hero_middle,
-            hero_banner=hero_banner,
-            category_hero_images=category_hero_images,
-            get_image_url=get_image_url  # Make available in templates
+            top_categories=navigation['top_categories'],
+            current_year=datetime.now().year,
+            cart_count=0 if g.get('rendering_cached_page') else get_cart_count(),
+            defer_cart_count=g.get('rendering_cached_page', False),
+            hero_middle=navigation['hero_middle'],
+            hero_banner=navigation['hero_banner'],
+            category_hero_images=navigation['category_hero_images'],
+            get_image_url=get_image_url,  # Make available in templates
+            responsive_image=responsive_image
         )
     except Exception as e:
         app.logger.error(f"Error in context processor: {str(e)}")
@@ -728,18 +2341,22 @@ def inject_common_data():
             top_categories=[],
             current_year=datetime.now().year,
             cart_count=0,
+            defer_cart_count=False,
             hero_middle=None,
             hero_banner=None,
             category_hero_images={},
-            get_image_url=get_image_url
+            get_image_url=get_image_url,
+            responsive_image=responsive_image
         )
 
 # Routes
 @app.route('/')
+@cached_page()
 def home():
     try:
-        # Get top-level categories safely
-        top_categories = get_safe_top_categories()
+        # Top-level categories come from the cached tree - no queries
+        tree = get_category_tree()
+        top_categories = [tree.node(category_id) for category_id in tree.top_level_ids()]
 
         # Get hero middle section
         hero_middle = HeroMiddle.query.filter_by(is_active=True).order_by(HeroMiddle.created_at.desc()).first()
@@ -750,32 +2367,25 @@ def home():
         # Get hot sales with proper image handling - only active products
         hot_sales = HotSale.query.join(Product).filter(
             Product.is_active == True
-        ).order_by(HotSale.position).limit(8).all()
+        ).options(db.contains_eager(HotSale.product)).order_by(HotSale.position).limit(8).all()
         
         for hot_sale in hot_sales:
             hot_sale.display_image = get_hot_sale_image(hot_sale)
         
         # Prepare category products for the front page sections
+        try:
+            latest_products = get_latest_products_by_top_category(limit=8)
+        except Exception as e:
+            app.logger.error(f"Error getting homepage category products: {str(e)}")
+            db.session.rollback()
+            latest_products = {}
+            # Don't share this degraded page through the page cache
+            g.skip_page_cache = True
+        
         category_products = []
         for category in top_categories:
-            try:
-                # Get all child category IDs
-                child_ids = [child.id for child in category.children]
-                # Always include the main category ID
-                child_ids.append(category.id)
-                
-                # Fetch products from these categories (only active products)
-                products = Product.query.filter(
-                    Product.category_id.in_(child_ids),
-                    Product.is_active == True
-                ).order_by(Product.created_at.desc()).limit(8).all()
-                # Attach products to category object
-                category.products = products
-                category_products.append(category)
-            except Exception as e:
-                app.logger.error(f"Error getting products for category {category.id}: {str(e)}")
-                category.products = []
-                category_products.append(category)
+            category.products = latest_products.get(category.id, [])
+            category_products.append(category)
 
         return render_template('index.html', 
                                top_categories=top_categories,
@@ -801,15 +2411,33 @@ def admin_dashboard():
         product_count = Product.query.filter_by(is_active=True).count()
         
         # Get all categories for display
-        categories = Category.query.all()
+        categories = get_hierarchical_categories()
         
         # Get recent products (only active)
         products = Product.query.filter_by(is_active=True).order_by(Product.created_at.desc()).limit(5).all()
         
+        # Last 30 days of non-cancelled sales per top-level category, read from the rollup
+        tree = get_category_tree()
+        category_sales = [
+            SimpleNamespace(
+                name='All orders' if category_id == ALL_CATEGORIES else tree.names.get(category_id, 'Unknown'),
+                orders=orders, revenue=revenue, items=items
+            )
+            for category_id, orders, revenue, items in db.session.execute(
+                db.select(DailySales.category_id, db.func.sum(DailySales.orders),
+                          db.func.sum(DailySales.revenue), db.func.sum(DailySales.items))
+                .where(DailySales.day >= datetime.utcnow().date() - timedelta(days=29),
+                       DailySales.status != 'Cancelled')
+                .group_by(DailySales.category_id)
+                .order_by(db.func.sum(DailySales.revenue).desc())
+            )
+        ]
+        
         return render_template('admin/dashboard.html', 
                                product_count=product_count,
                                categories=categories,
-                               products=products)
+                               products=products,
+                               category_sales=category_sales)
     except Exception as e:
         app.logger.error(f"Error in admin dashboard: {str(e)}")
         flash('Error loading dashboard', 'danger')
@@ -865,8 +2493,7 @@ def admin_products():
         if 'image' in request.files:
             file = request.files['image']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                filename = save_uploaded_image(file)
                 image = filename
         
         # Create product object - category_id is guaranteed to be valid
@@ -915,18 +2542,17 @@ def edit_product(product_id):
         if 'image' in request.files:
             file = request.files['image']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                # Delete old image if exists
-                if product.image and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], product.image)):
-                    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], product.image))
+                filename = save_uploaded_image(file)
+                # Delete old image if exists (and isn't the file just saved under the same name)
+                if product.image and product.image != filename and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], product.image)):
+                    delete_uploaded_image(product.image)
                 product.image = filename
         
         # Handle image deletion
         if 'delete_image' in request.form and request.form['delete_image'] == 'on':
             if product.image:
                 try:
-                    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], product.image))
+                    delete_uploaded_image(product.image)
                 except Exception as e:
                     app.logger.error(f"Error deleting image: {e}")
                 product.image = None
@@ -996,7 +2622,7 @@ def delete_product_permanent(product_id):
         # Delete image file if exists
         if product.image:
             try:
-                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], product.image))
+                delete_uploaded_image(product.image)
             except Exception as e:
                 app.logger.error(f"Error deleting image: {e}")
         
@@ -1027,7 +2653,7 @@ def admin_hero_middle():
             # Delete image file
             if hero_middle.image:
                 try:
-                    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], hero_middle.image))
+                    delete_uploaded_image(hero_middle.image)
                 except Exception as e:
                     app.logger.error(f"Error deleting image: {e}")
                 hero_middle.image = None
@@ -1046,12 +2672,11 @@ def admin_hero_middle():
         if 'image' in request.files:
             file = request.files['image']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                filename = save_uploaded_image(file)
                 # Delete old image if exists
-                if hero_middle.image:
+                if hero_middle.image and hero_middle.image != filename:
                     try:
-                        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], hero_middle.image))
+                        delete_uploaded_image(hero_middle.image)
                     except Exception as e:
                         app.logger.error(f"Error deleting old image: {e}")
                 hero_middle.image = filename
@@ -1078,12 +2703,11 @@ def admin_hero_banner():
         if 'image' in request.files:
             file = request.files['image']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                filename = save_uploaded_image(file)
                 # Delete old image if exists
-                if hero_banner.image:
+                if hero_banner.image and hero_banner.image != filename:
                     try:
-                        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], hero_banner.image))
+                        delete_uploaded_image(hero_banner.image)
                     except Exception as e:
                         app.logger.error(f"Error deleting old image: {e}")
                 hero_banner.image = filename
@@ -1093,7 +2717,7 @@ def admin_hero_banner():
             # Delete image file
             if hero_banner.image:
                 try:
-                    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], hero_banner.image))
+                    delete_uploaded_image(hero_banner.image)
                 except Exception as e:
                     app.logger.error(f"Error deleting image: {e}")
                 hero_banner.image = None
@@ -1109,7 +2733,8 @@ def admin_hero_banner():
 @app.route('/admin/category-images', methods=['GET', 'POST'])
 @admin_required
 def admin_category_images():
-    categories = Category.query.filter_by(parent_id=None).all()
+    tree = get_category_tree()
+    categories = [tree.node(category_id) for category_id in tree.top_level_ids()]
     
     # Create a dictionary of category_id to images
     category_images = {}
@@ -1126,8 +2751,7 @@ def admin_category_images():
             files = request.files.getlist('images')
             for file in files[:8]:  # Limit to 8 files
                 if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                    filename = save_uploaded_image(file)
                     
                     # Check if we've reached the 8-image limit
                     existing_count = CategoryImage.query.filter_by(category_id=category_id).count()
@@ -1166,7 +2790,7 @@ def delete_category_image(image_id):
         # Delete image file
         if image.filename and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], image.filename)):
             try:
-                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], image.filename))
+                delete_uploaded_image(image.filename)
             except Exception as e:
                 app.logger.error(f"Error deleting image: {e}")
         
@@ -1201,8 +2825,7 @@ def admin_hot_sales():
                 if file_key in request.files:
                     file = request.files[file_key]
                     if file and allowed_file(file.filename):
-                        filename = secure_filename(file.filename)
-                        file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                        filename = save_uploaded_image(file)
                         image = filename
                 
                 hot_sale = HotSale(
@@ -1229,84 +2852,228 @@ def admin_hot_sales():
                            hot_sales=hot_sales,
                            all_products=all_products)
 
+# BACKGROUND SCRAPE JOBS
+SCRAPE_JOB_WORKERS = int(os.getenv('SCRAPE_JOB_WORKERS', 1))
+scrape_job_executor = ThreadPoolExecutor(max_workers=SCRAPE_JOB_WORKERS, thread_name_prefix='scrape-job')
+
+# A job still queued or running after this long lost its worker (recycled or redeployed mid-run)
+SCRAPE_JOB_STALE_AFTER = int(os.getenv('SCRAPE_JOB_STALE_AFTER', 3600))
+
+def update_scrape_job(job_id, **fields):
+    """Persist job progress right away so any worker can answer status polls"""
+    db.session.execute(db.update(ScrapeJob).where(ScrapeJob.id == job_id).values(**fields))
+    db.session.commit()
+
+def scrape_job_is_stale(job):
+    started = job.started_at or job.created_at
+    return (job.status in ('queued', 'running') and started is not None
+            and datetime.utcnow() - started > timedelta(seconds=SCRAPE_JOB_STALE_AFTER))
+
+def fail_stale_scrape_jobs():
+    """Mark queued/running jobs older than SCRAPE_JOB_STALE_AFTER as failed; returns how many"""
+    cutoff = datetime.utcnow() - timedelta(seconds=SCRAPE_JOB_STALE_AFTER)
+    try:
+        result = db.session.execute(
+            db.update(ScrapeJob)
+            .where(ScrapeJob.status.in_(('queued', 'running')),
+                   db.func.coalesce(ScrapeJob.started_at, ScrapeJob.created_at) < cutoff)
+            .values(status='failed', finished_at=datetime.utcnow(),
+                    message='The worker running this job stopped before it finished. Please submit it again.')
+        )
+        db.session.commit()
+    except Exception as e:
+        app.logger.error(f"Error failing stale scrape jobs: {str(e)}")
+        db.session.rollback()
+        return 0
+    if result.rowcount:
+        app.logger.warning(f"Marked {result.rowcount} stale scrape jobs as failed")
+    return result.rowcount
+
+def parse_scraped_items(url, html):
+    """Extract product dicts from a listing page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Example scraping logic - adjust based on target site
+    items = []
+    for item in soup.select('.product-item'):
+        try:
+            name = item.select_one('.product-name').text.strip()
+            price_text = item.select_one('.price').text.replace('KSh', '').replace(',', '').strip()
+            price = float(price_text)
+            image_url = urljoin(url, item.select_one('.product-image img')['src'])
+            product_url = item.select_one('.product-name a')['href']
+            
+            items.append({
+                'name': name,
+                'price': price,
+                'image_url': image_url,
+                'original_url': product_url
+            })
+        except Exception as e:
+            app.logger.error(f"Error scraping product: {e}")
+    
+    # One entry per original_url - the page may list a product twice
+    return list({item['original_url']: item for item in items}.values())
+
+def run_scrape_job(job_id):
+    """Fetch, parse, download and upsert one scrape job - runs on the scrape-job executor"""
+    with app.app_context():
+        try:
+            job = db.session.get(ScrapeJob, job_id)
+            if not job or job.status != 'queued':
+                # Already given up on as stale
+                return
+            url, category_id = job.url, job.category_id
+            update_scrape_job(job_id, status='running', started_at=datetime.utcnow())
+            
+            response = http_session.get(url, timeout=(SCRAPE_CONNECT_TIMEOUT, SCRAPE_READ_TIMEOUT))
+            items = parse_scraped_items(url, response.text)
+            
+            # Compare against what is already stored so unchanged products cost nothing
+            existing = {
+                row.original_url: row for row in db.session.execute(
+                    db.select(Product.original_url, Product.name, Product.price,
+                              Product.category_id, Product.image)
+                    .where(Product.original_url.in_([item['original_url'] for item in items]))
+                ).all()
+            } if items else {}
+            
+            new_items, changed_items, unchanged = [], [], 0
+            for item in items:
+                stored = existing.get(item['original_url'])
+                if stored is None or not stored.image:
+                    new_items.append(item)
+                elif (stored.name, stored.price, stored.category_id) != (item['name'], item['price'], category_id):
+                    changed_items.append(item)
+                else:
+                    unchanged += 1
+            update_scrape_job(job_id, total_items=len(items), processed_items=unchanged + len(changed_items),
+                              unchanged=unchanged)
+            
+            # Report progress at most about once a second while images download
+            last_report = [0.0]
+            def on_progress(done, total):
+                now = time.monotonic()
+                if done == total or now - last_report[0] >= 1.0:
+                    last_report[0] = now
+                    update_scrape_job(job_id, processed_items=unchanged + len(changed_items) + done)
+            
+            # Download images concurrently over the shared session - only for new products
+            fetch_start = time.perf_counter()
+            reports = download_images([item['image_url'] for item in new_items], app.config['SCRAPED_IMAGES'],
+                                      on_progress=on_progress)
+            fetch_elapsed = time.perf_counter() - fetch_start
+            
+            products = []
+            for item, report in zip(new_items, reports):
+                if report['filename']:
+                    products.append(dict(item, image=report['filename']))
+            # Changed products keep their stored image (image=None is coalesced away)
+            products.extend(dict(item, image=None) for item in changed_items)
+            failed_images = sum(1 for report in reports if not report['filename'])
+            
+            fetch_summary = ''
+            if reports:
+                slowest = max(report['seconds'] for report in reports)
+                fetch_summary = (f' Fetched {len(reports) - failed_images}/{len(reports)} images in '
+                                 f'{fetch_elapsed:.1f}s (slowest {slowest:.1f}s).')
+            
+            # Save products to database
+            added = 0
+            if products:
+                now = datetime.utcnow()
+                upsert_scraped_products([
+                    {
+                        'name': product_data['name'],
+                        'price': product_data['price'],
+                        'discount': 0.0,
+                        'image': product_data['image'],
+                        'category_id': category_id,
+                        'created_at': now,
+                        'is_scraped': True,
+                        'original_url': product_data['original_url'],
+                        'is_active': True,
+                    }
+                    for product_data in products
+                ])
+                if not safe_commit():
+                    update_scrape_job(job_id, status='failed', finished_at=datetime.utcnow(),
+                                      failed_images=failed_images,
+                                      message='Error saving scraped products.' + fetch_summary)
+                    return
+                added = sum(1 for product_data in products if product_data['original_url'] not in existing)
+            
+            if items:
+                message = f'{added} products added, {len(products) - added} updated and {unchanged} unchanged.'
+            else:
+                message = 'No products found on the page. Please check the URL and page structure.'
+            update_scrape_job(job_id, status='completed', finished_at=datetime.utcnow(),
+                              processed_items=len(items), added=added, updated=len(products) - added,
+                              failed_images=failed_images, message=message + fetch_summary)
+        except Exception as e:
+            app.logger.error(f"Scraping error in job {job_id}: {e}")
+            db.session.rollback()
+            try:
+                update_scrape_job(job_id, status='failed', finished_at=datetime.utcnow(),
+                                  message=f'Error scraping products: {str(e)}')
+            except Exception as e2:
+                app.logger.error(f"Could not record failure for scrape job {job_id}: {e2}")
+        finally:
+            db.session.remove()
+
 @app.route('/scrape-products', methods=['GET', 'POST'])
 @admin_required
 def scrape_products():
     if request.method == 'POST':
         url = request.form.get('url')
         category_id = request.form.get('category_id')
-        message = None
-        category = None
         
         # Validate category ID
         if not category_id:
             flash('Please select a category', 'danger')
             return redirect(url_for('scrape_products'))
         
-        try:
-            category_id = int(category_id)
-            category = Category.query.get(category_id)
-            if not category:
-                flash(f'Category with ID {category_id} not found', 'danger')
-                return redirect(url_for('scrape_products'))
-            
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Example scraping logic - adjust based on target site
-            products = []
-            for item in soup.select('.product-item'):
-                try:
-                    name = item.select_one('.product-name').text.strip()
-                    price_text = item.select_one('.price').text.replace('KSh', '').replace(',', '').strip()
-                    price = float(price_text)
-                    image_url = item.select_one('.product-image img')['src']
-                    product_url = item.select_one('.product-name a')['href']
-                    
-                    # Download image
-                    image_filename = download_image(image_url, app.config['SCRAPED_IMAGES'])
-                    
-                    if image_filename:
-                        products.append({
-                            'name': name,
-                            'price': price,
-                            'image': image_filename,
-                            'original_url': product_url
-                        })
-                except Exception as e:
-                    app.logger.error(f"Error scraping product: {e}")
-            
-            # Save products to database
-            if products:
-                for product_data in products:
-                    product = Product(
-                        name=product_data['name'],
-                        price=product_data['price'],
-                        image=product_data['image'],
-                        category_id=category_id,
-                        is_scraped=True,
-                        original_url=product_data['original_url']
-                    )
-                    db.session.add(product)
-                
-                if safe_commit():
-                    flash(f'{len(products)} products scraped and added to {category.name} successfully!', 'success')
-                else:
-                    flash('Error saving scraped products', 'danger')
-            else:
-                flash('No products found on the page. Please check the URL and page structure.', 'warning')
-                
-        except Exception as e:
-            app.logger.exception(f"Scraping error: {e}")
-            error_msg = f'Error scraping products: {str(e)}'
-            if category:
-                error_msg += f' (Category: {category.name})'
-            flash(error_msg, 'danger')
+        category_id = int(category_id)
+        if category_id not in get_category_tree() and not db.session.get(Category, category_id):
+            flash(f'Category with ID {category_id} not found', 'danger')
+            return redirect(url_for('scrape_products'))
         
-        return redirect(url_for('scrape_products'))
+        fail_stale_scrape_jobs()
+        job = ScrapeJob(url=url, category_id=category_id, status='queued')
+        db.session.add(job)
+        if not safe_commit():
+            flash('Error queueing scrape job', 'danger')
+            return redirect(url_for('scrape_products'))
+        
+        # The job outlives this request; the browser polls its status instead
+        scrape_job_executor.submit(run_scrape_job, job.id)
+        return redirect(url_for('scrape_job_detail', job_id=job.id))
     
     categories = get_hierarchical_categories()
-    return render_template('admin/scrape_products.html', categories=categories)
+    recent_jobs = ScrapeJob.query.order_by(ScrapeJob.created_at.desc()).limit(10).all()
+    return render_template('admin/scrape_products.html', categories=categories, recent_jobs=recent_jobs)
+
+@app.route('/admin/scrape-jobs/<int:job_id>')
+@admin_required
+def scrape_job_detail(job_id):
+    job = db.session.get(ScrapeJob, job_id)
+    if not job:
+        flash('Scrape job not found', 'danger')
+        return redirect(url_for('scrape_products'))
+    return render_template('admin/scrape_job.html', job=job)
+
+@app.route('/admin/scrape-jobs/<int:job_id>/status')
+@admin_required
+def scrape_job_status(job_id):
+    job = db.session.get(ScrapeJob, job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Scrape job not found'}), 404
+    if scrape_job_is_stale(job):
+        fail_stale_scrape_jobs()
+        db.session.refresh(job)
+    response = jsonify(dict(job.to_dict(), success=True))
+    response.cache_control.no_store = True
+    return response
 
 @app.route('/admin/categories', methods=['GET', 'POST'])
 @admin_required
@@ -1332,14 +3099,24 @@ def admin_categories():
         return redirect(url_for('admin_categories'))
     
     # Get all categories in hierarchical order (with depth)
-    hierarchical_categories = get_hierarchical_categories()
+    tree = get_category_tree()
+    hierarchical_categories = tree.hierarchical()
+    
+    # Direct product counts for every category in one grouped query
+    product_counts = dict(db.session.execute(
+        db.select(Product.category_id, db.func.count(Product.id)).group_by(Product.category_id)
+    ).all())
     
     # Create a dictionary of all categories for quick lookup
-    all_categories = Category.query.all()
-    categories_dict = {cat.id: cat for cat in all_categories}
+    categories_dict = {}
+    for category_id in tree.order:
+        node = tree.node(category_id)
+        node.parent = tree.node(node.parent_id) if node.parent_id else None
+        node.product_count = product_counts.get(category_id, 0)
+        categories_dict[category_id] = node
     
     # Get all parent categories for dropdown
-    parent_categories = Category.query.filter_by(parent_id=None).all()
+    parent_categories = [tree.node(category_id) for category_id in tree.top_level_ids()]
     
     return render_template('admin/categories.html', 
                            hierarchical_categories=hierarchical_categories,
@@ -1352,7 +3129,10 @@ def delete_category(category_id):
     category = db.session.get(Category, category_id)
     if category:
         # Check if category has products or children
-        if category.products or category.children:
+        has_products = db.session.query(
+            Product.query.filter_by(category_id=category_id).exists()
+        ).scalar()
+        if has_products or get_category_tree().children.get(category_id):
             flash('Cannot delete category with products or subcategories', 'danger')
         else:
             db.session.delete(category)
@@ -1365,33 +3145,44 @@ def delete_category(category_id):
     return redirect(url_for('admin_categories'))
 
 @app.route('/category/<int:category_id>')
+@cached_page('sort', 'after', 'before')
 def category(category_id):
-    category = db.session.get(Category, category_id)
-    if not category:
-        flash('Category not found', 'danger')
-        return redirect(url_for('home'))
+    tree = get_category_tree()
+    if category_id not in tree:
+        # The cached tree may predate a category created by another worker
+        if not db.session.get(Category, category_id):
+            flash('Category not found', 'danger')
+            return redirect(url_for('home'))
+        invalidate_category_tree()
+        tree = get_category_tree()
+    category = tree.node(category_id)
     
     # Get all subcategories
     subcategories = category.children
     
-    # Get products in this category and all subcategories (only active products)
-    category_ids = [c.id for c in category.children] + [category.id]
-    products = Product.query.filter(
-        Product.category_id.in_(category_ids),
-        Product.is_active == True
-    ).all()
-    
-    cart_count = get_cart_count()
-    cart_total = get_cart_total()[0]
+    # One page of products in this category and every category below it (only active products)
+    category_ids = tree.subtree_ids(category_id)
+    sort_by = request.args.get('sort', 'newest')
+    if sort_by not in CATEGORY_SORTS:
+        sort_by = 'newest'
+    products, has_next, has_prev = get_category_page(
+        category_ids,
+        sort_by=sort_by,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int)
+    )
     
     return render_template('category.html',
                            category=category,
                            subcategories=subcategories,
                            products=products,
-                           cart_count=cart_count,
-                           cart_total=cart_total)
+                           product_count=get_category_product_count(category_id, category_ids),
+                           sort_by=sort_by,
+                           has_next=has_next,
+                           has_prev=has_prev)
 
 @app.route('/product/<int:product_id>')
+@cached_page()
 def product_detail(product_id):
     product = db.session.get(Product, product_id)
     if not product or not product.is_active:
@@ -1405,14 +3196,9 @@ def product_detail(product_id):
         Product.is_active == True
     ).limit(4).all()
     
-    cart_count = get_cart_count()
-    cart_total = get_cart_total()[0]
-    
-    return render_template('product_detail.html',
+    return render_template('product.html',
                            product=product,
-                           related_products=related_products,
-                           cart_count=cart_count,
-                           cart_total=cart_total)
+                           related_products=related_products)
 
 # FIXED: Only POST route for add-to-cart (removed GET route)
 @app.route('/add-to-cart/<int:product_id>', methods=['POST'])
@@ -1420,18 +3206,20 @@ def add_to_cart(product_id):
     product = db.session.get(Product, product_id)
     if not product or not product.is_active:
         return jsonify({'success': False, 'message': 'Product not available'})
+    product_name = product.name  # Read before commit expires the instance
     
     if current_user.is_authenticated and not current_user.is_admin:
-        # Add to database cart for authenticated users
-        cart_item = Cart.query.filter_by(user_id=current_user.id, product_id=product_id).first()
-        if cart_item:
-            cart_item.quantity += 1
-        else:
-            cart_item = Cart(user_id=current_user.id, product_id=product_id)
-            db.session.add(cart_item)
-        if safe_commit():
-            message = f'{product.name} added to cart!'
+        # Add to database cart for authenticated users - atomic, so concurrent clicks can't duplicate rows
+        cart_count = None
+        try:
+            _, cart_count = add_cart_item(current_user.id, product_id)
+        except Exception as e:
+            app.logger.error(f"Error adding to cart: {e}")
+            db.session.rollback()
+        if cart_count is not None and safe_commit():
+            message = f'{product_name} added to cart!'
         else:
+            cart_count = get_cart_count()
             message = 'Error adding to cart'
     else:
         # Add to session cart for guests
@@ -1441,13 +3229,14 @@ def add_to_cart(product_id):
         cart = session['cart']
         cart[str(product_id)] = cart.get(str(product_id), 0) + 1
         session['cart'] = cart
-        message = f'{product.name} added to cart!'
+        cart_count = len(cart)
+        message = f'{product_name} added to cart!'
     
     # Return JSON response for AJAX requests
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return jsonify({
             'success': True, 
-            'cart_count': get_cart_count(),
+            'cart_count': cart_count,
             'message': message
         })
     
@@ -1467,24 +3256,15 @@ def update_cart(item_id):
             if quantity > 0:
                 cart_item.quantity = quantity
                 if safe_commit():
-                    return jsonify({
-                        'success': True,
-                        'subtotal': get_cart_total()[0],
-                        'discounts': get_cart_total()[1],
-                        'total': get_cart_total()[0] + 300
-                    })
+                    reset_cart_pricing()
+                    return cart_totals_json()
                 else:
                     return jsonify({'success': False, 'message': 'Error updating cart'})
             else:
                 db.session.delete(cart_item)
                 if safe_commit():
-                    return jsonify({
-                        'success': True,
-                        'removed': True,
-                        'subtotal': get_cart_total()[0],
-                        'discounts': get_cart_total()[1],
-                        'total': get_cart_total()[0] + 300
-                    })
+                    reset_cart_pricing()
+                    return cart_totals_json(removed=True)
                 else:
                     return jsonify({'success': False, 'message': 'Error removing item'})
     else:
@@ -1507,59 +3287,67 @@ def update_cart(item_id):
                 else:
                     del cart[str(item_id)]
                 session['cart'] = cart
-                return jsonify({
-                    'success': True,
-                    'removed': quantity <= 0,
-                    'subtotal': get_cart_total()[0],
-                    'discounts': get_cart_total()[1],
-                    'total': get_cart_total()[0] + 300
-                })
+                reset_cart_pricing()
+                return cart_totals_json(removed=quantity <= 0)
     
     return jsonify({'success': False, 'message': 'Item not found'})
 
-@app.route('/cart')
-def view_cart():
-    cart_items = []
-    subtotal = 0.0
-    discounts = 0.0
-    total = 0.0
+@app.route('/update-cart', methods=['POST'])
+def update_cart_batch():
+    """Apply several line changes in one transaction: {"changes": [{"item_id": 1, "quantity": 0}, ...]}.
+
+    A quantity of 0 (or "remove": true) removes the line. Totals are priced once for the whole batch.
+    """
+    payload = request.get_json(silent=True) or {}
+    changes = {}
+    try:
+        for change in payload.get('changes', []):
+            quantity = 0 if change.get('remove') else int(change.get('quantity', 1))
+            changes[int(change['item_id'])] = max(quantity, 0)  # Last change to a line wins
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({'success': False, 'message': 'Invalid cart changes'}), 400
     
+    removed = []
     if current_user.is_authenticated and not current_user.is_admin:
-        # Get cart items from database for authenticated users
-        cart_items_db = Cart.query.filter_by(user_id=current_user.id).all()
-        for item in cart_items_db:
-            product = db.session.get(Product, item.product_id)
-            if product and product.is_active:
-                discounted_price = product.price * (1 - (product.discount / 100))
-                subtotal += discounted_price * item.quantity
-                discounts += (product.price * (product.discount / 100)) * item.quantity
-                # Add product to display list
-                cart_items.append({
-                    'id': item.id,
-                    'product': product,
-                    'quantity': item.quantity
-                })
-    elif 'cart' in session:
-        # Get cart items from session for guests
-        for product_id, quantity in session['cart'].items():
-            product = db.session.get(Product, int(product_id))
-            if product and product.is_active:
-                discounted_price = product.price * (1 - (product.discount / 100))
-                subtotal += discounted_price * quantity
-                discounts += (product.price * (product.discount / 100)) * quantity
-                cart_items.append({
-                    'id': product.id,
-                    'product': product,
-                    'quantity': quantity
-                })
-    
-    total = subtotal + 300  # Add delivery fee
+        if changes:
+            cart_items = Cart.query.filter(Cart.user_id == current_user.id, Cart.id.in_(list(changes))).all()
+            for cart_item in cart_items:
+                quantity = changes[cart_item.id]
+                if quantity > 0:
+                    cart_item.quantity = quantity
+                else:
+                    db.session.delete(cart_item)
+                    removed.append(cart_item.id)
+            if not safe_commit():
+                return jsonify({'success': False, 'message': 'Error updating cart'})
+    else:
+        cart = session.get('cart', {})
+        for item_id, quantity in changes.items():
+            if str(item_id) not in cart:
+                continue
+            if quantity > 0:
+                cart[str(item_id)] = quantity
+            else:
+                del cart[str(item_id)]
+                removed.append(item_id)
+        session['cart'] = cart
     
+    reset_cart_pricing()
+    pricing = get_cart_pricing()
+    return cart_totals_json(
+        removed=removed,
+        cart_count=get_cart_count(),
+        lines={str(line.id): {'quantity': line.quantity, 'line_total': line.line_total} for line in pricing.lines}
+    )
+
+@app.route('/cart')
+def view_cart():
+    pricing = get_cart_pricing()
     return render_template('cart.html',
-                           cart_items=cart_items,
-                           subtotal=subtotal,
-                           discounts=discounts,
-                           total=total)
+                           cart_items=pricing.lines,
+                           subtotal=pricing.subtotal,
+                           discounts=pricing.discounts,
+                           total=pricing.total)
 
 @app.route('/remove-from-cart/<int:item_id>')
 def remove_from_cart(item_id):
@@ -1590,40 +3378,18 @@ def clear_cart():
 
 @app.route('/checkout')
 def checkout():
+    pricing = get_cart_pricing()
+    
     # Redirect to cart if empty
-    if (current_user.is_authenticated and not current_user.is_admin and Cart.query.filter_by(user_id=current_user.id).count() == 0) or \
-       (not current_user.is_authenticated and ('cart' not in session or len(session['cart']) == 0)):
+    if not pricing.lines:
         flash('Your cart is empty', 'warning')
         return redirect(url_for('view_cart'))
     
-    cart_total, discounts = get_cart_total()
-    total = cart_total + 300  # Delivery fee
-    
-    # Get cart items for display
-    cart_items = []
-    if current_user.is_authenticated and not current_user.is_admin:
-        cart_items_db = Cart.query.filter_by(user_id=current_user.id).all()
-        for item in cart_items_db:
-            product = db.session.get(Product, item.product_id)
-            if product and product.is_active:
-                cart_items.append({
-                    'product': product,
-                    'quantity': item.quantity
-                })
-    elif 'cart' in session:
-        for product_id, quantity in session['cart'].items():
-            product = db.session.get(Product, int(product_id))
-            if product and product.is_active:
-                cart_items.append({
-                    'product': product,
-                    'quantity': quantity
-                })
-    
     return render_template('checkout.html',
-                           cart_items=cart_items,
-                           subtotal=cart_total,
-                           discounts=discounts,
-                           total=total)
+                           cart_items=pricing.lines,
+                           subtotal=pricing.subtotal,
+                           discounts=pricing.discounts,
+                           total=pricing.total)
 
 @app.route('/place-order', methods=['POST'])
 def place_order():
@@ -1635,9 +3401,9 @@ def place_order():
     address = request.form.get('address')
     notes = request.form.get('notes')
     
-    # Get cart total
-    cart_total, discounts = get_cart_total()
-    total = cart_total + 300  # Delivery fee
+    # Price the cart once; the order total and line prices come from the same snapshot
+    pricing = get_cart_pricing()
+    total = pricing.total
     
     # Create order
     order = Order(
@@ -1653,46 +3419,39 @@ def place_order():
     db.session.add(order)
     db.session.flush()  # Get order ID
     
-    # Add order items
+    # Add order items in one executemany
+    if pricing.lines:
+        db.session.execute(db.insert(OrderItem), [
+            {
+                'order_id': order.id,
+                'product_id': line.product.id,
+                'quantity': line.quantity,
+                'price': line.unit_price
+            }
+            for line in pricing.lines
+        ])
+    
+    # Keep the daily sales rollup in step with the order, in the same transaction
+    bump_sales_rollup(sales_rollup_rows(
+        order.created_at.date(), order.status, total,
+        [(line.product.category_id, line.quantity, line.line_total) for line in pricing.lines]
+    ))
+    
+    # Queue the order email in the same transaction; the send-outbox worker delivers it
+    queue_order_email(order, [
+        SimpleNamespace(product=line.product, quantity=line.quantity, price=line.unit_price)
+        for line in pricing.lines
+    ])
+    
     if current_user.is_authenticated and not current_user.is_admin:
-        cart_items = Cart.query.filter_by(user_id=current_user.id).all()
-        for item in cart_items:
-            product = db.session.get(Product, item.product_id)
-            if product and product.is_active:
-                discounted_price = product.price * (1 - (product.discount / 100))
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price=discounted_price
-                )
-                db.session.add(order_item)
-        
         # Clear cart
         Cart.query.filter_by(user_id=current_user.id).delete()
     else:
-        # Session cart for guests
-        for product_id, quantity in session['cart'].items():
-            product = db.session.get(Product, int(product_id))
-            if product and product.is_active:
-                discounted_price = product.price * (1 - (product.discount / 100))
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=product.id,
-                    quantity=quantity,
-                    price=discounted_price
-                )
-                db.session.add(order_item)
-        
         # Clear session cart
         session.pop('cart', None)
     
     if safe_commit():
-        # Get order items for email
-        order_items = OrderItem.query.filter_by(order_id=order.id).all()
-        
-        # Send order email
-        send_order_email(order, order_items)
+        reset_cart_pricing()
         
         return render_template('order_success.html',
                                order_id=order.id,
@@ -1706,87 +3465,143 @@ def place_order():
 
 @app.route('/search')
 def search():
-    query = request.args.get('q', '')
+    query = request.args.get('q', '').strip()
     sort_by = request.args.get('sort', 'relevance')  # Get sort parameter
+    page = request.args.get('page', 1, type=int)
     
-    # Get all categories for navigation
-    categories = Category.query.all()
-    
+    pagination = None
+    products = []
     if query:
-        # Search in product name and description (only active products)
-        search_term = f"%{query}%"
-        products = Product.query.filter(
-            (Product.name.ilike(search_term)) | 
-            (Product.description.ilike(search_term)),
-            Product.is_active == True
-        ).all()
-        
-        # Apply sorting
-        if sort_by == 'price_low_high':
-            products = sorted(products, key=lambda p: p.price)
-        elif sort_by == 'price_high_low':
-            products = sorted(products, key=lambda p: p.price, reverse=True)
-        elif sort_by == 'name_asc':
-            products = sorted(products, key=lambda p: p.name.lower())
-        elif sort_by == 'name_desc':
-            products = sorted(products, key=lambda p: p.name.lower(), reverse=True)
-        # 'relevance' is the default, no additional sorting needed
-    else:
-        products = []
+        # Matching, ordering and paging all happen in SQL (only active products)
+        pagination = db.paginate(product_search_query(query, sort_by), page=page,
+                                 per_page=SEARCH_PAGE_SIZE, error_out=False)
+        products = pagination.items
     
     return render_template('search_results.html', 
                            products=products, 
+                           pagination=pagination,
                            query=query,
-                           categories=categories,
                            sort_by=sort_by)
 
+@app.route('/search/suggest')
+def search_suggest():
+    """Autocomplete for the header search box, served from the in-memory name index"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', SUGGEST_LIMIT, type=int), 20)
+    product_suggestions.refresh()
+    response = jsonify({'products': [
+        {
+            'id': entry['id'],
+            'name': entry['name'],
+            'price': entry['price'],
+            'discount': entry['discount'] or 0,
+            'thumbnail': get_image_url(entry['image'], 'thumb') if entry['image'] else None,
+        }
+        for entry in product_suggestions.lookup(query, limit)
+    ]})
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response
+
+ADMIN_ORDERS_PAGE_SIZE = int(os.getenv('ADMIN_ORDERS_PAGE_SIZE', 50))
+ORDER_STATUSES = ('Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled')
+
 @app.route('/orders')
 @admin_required
 def view_orders():
-    # Get all orders sorted by creation date (newest first)
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    
-    # Calculate order counts by status
-    status_counts = {
-        'Pending': Order.query.filter_by(status='Pending').count(),
-        'Processing': Order.query.filter_by(status='Processing').count(),
-        'Shipped': Order.query.filter_by(status='Shipped').count(),
-        'Delivered': Order.query.filter_by(status='Delivered').count(),
-        'Cancelled': Order.query.filter_by(status='Cancelled').count()
-    }
-    
-    # Calculate total revenue
-    total_revenue = db.session.query(db.func.sum(Order.total_amount)).scalar() or 0.0
-    
-    # Get recent orders (last 7 days)
-    seven_days_ago = datetime.now() - timedelta(days=7)
-    recent_orders = Order.query.filter(Order.created_at >= seven_days_ago).count()
+    page = max(request.args.get('page', 1, type=int), 1)
+    week_start = datetime.utcnow().date() - timedelta(days=6)
+    
+    # Status counts, revenue and last-7-days count from the daily rollup, one GROUP BY
+    status_counts = dict.fromkeys(ORDER_STATUSES, 0)
+    total_revenue = 0.0
+    recent_orders = 0
+    for status, count, revenue, recent in db.session.execute(
+        db.select(
+            DailySales.status,
+            db.func.sum(DailySales.orders),
+            db.func.sum(DailySales.revenue),
+            db.func.sum(db.case((DailySales.day >= week_start, DailySales.orders), else_=0))
+        )
+        .where(DailySales.category_id == ALL_CATEGORIES)
+        .group_by(DailySales.status)
+    ):
+        status_counts[status] = count
+        total_revenue += revenue
+        recent_orders += recent
+    
+    # The pager counts the orders table itself so it never depends on the rollup being in sync
+    total_orders = db.session.execute(db.select(db.func.count(Order.id))).scalar()
+    
+    # One page of orders (newest first) with item counts from a grouped subquery limited to that page
+    pages = max((total_orders + ADMIN_ORDERS_PAGE_SIZE - 1) // ADMIN_ORDERS_PAGE_SIZE, 1)
+    page = min(page, pages)
+    page_ids = (
+        db.select(Order.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(ADMIN_ORDERS_PAGE_SIZE)
+        .offset((page - 1) * ADMIN_ORDERS_PAGE_SIZE)
+        .subquery()
+    )
+    item_counts = (
+        db.select(OrderItem.order_id, db.func.count(OrderItem.id).label('item_count'))
+        .where(OrderItem.order_id.in_(db.select(page_ids.c.id)))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(Order, db.func.coalesce(item_counts.c.item_count, 0))
+        .join(page_ids, page_ids.c.id == Order.id)
+        .outerjoin(item_counts, item_counts.c.order_id == Order.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    ).all()
     
     # Prepare data for the view
     order_data = []
-    for order in orders:
-        # Get order items count
-        item_count = OrderItem.query.filter_by(order_id=order.id).count()
-        
-        # Format created date
-        created_date = order.created_at.strftime('%b %d, %Y')
-        
+    for order, item_count in rows:
         order_data.append({
             'id': order.id,
             'order_number': order.order_number,
             'customer_name': f"{order.first_name} {order.last_name}",
-            'created_date': created_date,
+            'created_date': order.created_at.strftime('%b %d, %Y'),
             'total_amount': order.total_amount,
             'status': order.status,
             'item_count': item_count
         })
     
+    pagination = SimpleNamespace(
+        page=page,
+        pages=pages,
+        total=total_orders,
+        has_prev=page > 1,
+        has_next=page < pages,
+        prev_num=page - 1,
+        next_num=page + 1,
+    )
     return render_template('admin/orders.html', 
                            orders=order_data,
+                           pagination=pagination,
                            status_counts=status_counts,
+                           order_statuses=ORDER_STATUSES,
                            total_revenue=total_revenue,
                            recent_orders=recent_orders)
 
+@app.route('/orders/<int:order_id>/status', methods=['POST'])
+@admin_required
+def update_order_status(order_id):
+    order = db.session.get(Order, order_id)
+    status = request.form.get('status')
+    if not order or status not in ORDER_STATUSES:
+        flash('Invalid order or status', 'danger')
+        return redirect(url_for('view_orders'))
+    
+    change_order_status(order, status)
+    if safe_commit():
+        flash(f'Order {order.order_number} marked {status}', 'success')
+    else:
+        flash('Error updating order status', 'danger')
+    return redirect(request.referrer or url_for('view_orders'))
+
 @app.route('/test-email')
 def test_email():
     try:
@@ -1803,22 +3618,21 @@ def test_email():
         return f'Error: {str(e)}'
 
 @app.route('/about')
+@cached_page()
 def about():
-    cart_count = get_cart_count()
-    cart_total = get_cart_total()[0]
-    
-    return render_template('about.html',
-                           cart_count=cart_count,
-                           cart_total=cart_total)
+    return render_template('about.html')
 
 @app.route('/contact')
+@cached_page()
 def contact():
-    cart_count = get_cart_count()
-    cart_total = get_cart_total()[0]
-    
-    return render_template('contact.html',
-                           cart_count=cart_count,
-                           cart_total=cart_total)
+    return render_template('contact.html')
+
+@app.route('/cart-count')
+def cart_count_badge():
+    """Per-visitor cart badge for pages served from the shared page cache"""
+    response = jsonify({'cart_count': get_cart_count()})
+    response.cache_control.no_store = True
+    return response
 
 # ENHANCED DATABASE CONNECTION VERIFICATION BEFORE REQUESTS
 @app.before_request
@@ -1890,6 +3704,113 @@ def test_db_connection():
             "hint": "Check your PostgreSQL credentials and ensure pg8000 is installed"
         }), 500
 
+def get_pool_stats():
+    """Snapshot of connection pool state and checkout statistics for this worker"""
+    pool = db.engine.pool
+    with pool_stats_lock:
+        stats = dict(pool_stats)
+    
+    stats['wait_avg'] = stats['wait_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+    stats['pool_class'] = type(pool).__name__
+    stats['pid'] = os.getpid()
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+    return stats
+
+# CONNECTION POOL STATISTICS ROUTE
+@app.route('/admin/pool-stats')
+@admin_required
+def pool_stats_route():
+    """Per-worker pool usage, used to size DB_POOL_SIZE/DB_MAX_OVERFLOW"""
+    return jsonify(get_pool_stats()), 200
+
+# PROMETHEUS SCRAPE ENDPOINT
+def metrics_endpoint():
+    """Endpoint label for metrics - bounded to route names so label cardinality stays fixed"""
+    if not has_request_context():
+        return 'background'
+    return request.endpoint or 'unmatched'
+
+def current_rss_bytes():
+    """Current resident set size from /proc (Linux), None elsewhere"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+rss_sampled_at = [0.0]
+
+@app.before_request
+def track_request_in_progress():
+    REQUESTS_IN_PROGRESS.inc()
+    g.counted_in_progress = True
+    now = time.monotonic()
+    if now - rss_sampled_at[0] >= METRICS_RSS_INTERVAL:
+        rss_sampled_at[0] = now
+        rss = current_rss_bytes()
+        if rss is not None:
+            WORKER_RSS.set(rss)
+
+@app.teardown_request
+def untrack_request_in_progress(exc):
+    if g.pop('counted_in_progress', False):
+        REQUESTS_IN_PROGRESS.dec()
+
+class QueueDepthCollector:
+    """Outbox and scrape job backlogs, read from the database when /metrics is scraped"""
+    
+    def collect(self):
+        outbox = GaugeMetricFamily('email_outbox_messages', 'Outbox emails not yet sent', labels=['status'])
+        jobs = GaugeMetricFamily('scrape_jobs', 'Scrape jobs waiting or running', labels=['status'])
+        # Jobs orphaned by a recycled worker would otherwise count as running forever
+        fail_stale_scrape_jobs()
+        try:
+            outbox_counts = dict(db.session.execute(
+                db.select(EmailOutbox.status, db.func.count(EmailOutbox.id))
+                .where(EmailOutbox.status != 'sent').group_by(EmailOutbox.status)
+            ).all())
+            job_counts = dict(db.session.execute(
+                db.select(ScrapeJob.status, db.func.count(ScrapeJob.id))
+                .where(ScrapeJob.status.in_(('queued', 'running'))).group_by(ScrapeJob.status)
+            ).all())
+        except Exception as e:
+            app.logger.error(f"Queue depth metrics failed: {str(e)}")
+            db.session.rollback()
+            return
+        for status in ('pending', 'failed'):
+            outbox.add_metric([status], outbox_counts.get(status, 0))
+        for status in ('queued', 'running'):
+            jobs.add_metric([status], job_counts.get(status, 0))
+        yield outbox
+        yield jobs
+
+# Shared backlog numbers are read once per scrape rather than aggregated per worker
+queue_depth_registry = CollectorRegistry(auto_describe=False)
+queue_depth_registry.register(QueueDepthCollector())
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus exposition format, aggregated over every gunicorn worker in multiprocess mode"""
+    if METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'
+    ):
+        return jsonify({'error': 'unauthorized'}), 401
+    if METRICS_MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    response = make_response(generate_latest(registry) + generate_latest(queue_depth_registry))
+    response.headers['Content-Type'] = CONTENT_TYPE_LATEST
+    response.cache_control.no_store = True
+    return response
+
 # FIX ORPHANED PRODUCTS ROUTE
 @app.route('/fix-orphaned-products')
 @admin_required
@@ -1905,6 +3826,108 @@ def fix_orphaned_products_route():
     
     return redirect(url_for('admin_dashboard'))
 
+# PER-REQUEST SQL AND RENDER TIMING
+REQUEST_TIMING_LOG = os.getenv('REQUEST_TIMING_LOG', 'true').lower() in ('true', '1', 't')
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() in ('true', '1', 't')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 250))
+SLOW_QUERY_MAX_SQL = 2000  # characters of SQL kept in a slow query log line
+
+def current_request_timing():
+    """This request's timing counters, or None outside a request (workers, CLI, startup)"""
+    if has_request_context():
+        return g.get('request_timing')
+    return None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    timing = current_request_timing()
+    if timing is not None:
+        timing['db_queries'] += 1
+        timing['db_seconds'] += elapsed
+    DB_QUERIES.labels(metrics_endpoint()).inc()
+    DB_QUERY_LATENCY.observe(elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = f"{request.method} {request.path} ({request.endpoint})" if has_request_context() else 'outside a request'
+        # Statement only - parameters can carry customer details
+        app.logger.warning(
+            f"Slow query {elapsed * 1000:.1f} ms on {route}: {' '.join(statement.split())[:SLOW_QUERY_MAX_SQL]}"
+        )
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    timing = current_request_timing()
+    if timing is not None:
+        timing['render_started'].append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def record_render_time(sender, template, context, **extra):
+    timing = current_request_timing()
+    if timing is not None and timing['render_started']:
+        timing['render_seconds'] += time.perf_counter() - timing['render_started'].pop()
+
+@app.before_request
+def start_request_timing():
+    g.request_timing = {
+        'started': time.perf_counter(),
+        'db_queries': 0,
+        'db_seconds': 0.0,
+        'render_seconds': 0.0,
+        'render_started': [],
+    }
+
+@app.after_request
+def report_request_timing(response):
+    """Server-Timing header plus one JSON log line with query count, DB, render and total time"""
+    timing = g.pop('request_timing', None)
+    if timing is None:
+        return response
+    total_seconds = time.perf_counter() - timing['started']
+    REQUEST_LATENCY.labels(metrics_endpoint(), request.method, str(response.status_code)).observe(total_seconds)
+    total_ms = total_seconds * 1000
+    db_ms = timing['db_seconds'] * 1000
+    render_ms = timing['render_seconds'] * 1000
+    
+    if SERVER_TIMING_HEADER:
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{timing["db_queries"]} queries", '
+            f'render;dur={render_ms:.1f}, total;dur={total_ms:.1f}'
+        )
+    if REQUEST_TIMING_LOG and request.endpoint != 'static':
+        app.logger.info("request " + json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'db_queries': timing['db_queries'],
+            'db_ms': round(db_ms, 1),
+            'render_ms': round(render_ms, 1),
+            'total_ms': round(total_ms, 1),
+        }))
+    return response
+
+# LONG-LIVED CACHING FOR FINGERPRINTED UPLOADS
+@app.after_request
+def cache_versioned_uploads(response):
+    """Versioned upload URLs change whenever the file does, so clients may keep them forever"""
+    if (request.endpoint == 'static'
+            and response.status_code in (200, 304)
+            and request.args.get('v')
+            and request.view_args.get('filename', '').startswith(('uploads/', 'scraped_images/'))):
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
 # PG8000 PERFORMANCE OPTIMIZATION MIDDLEWARE
 @app.after_request
 def after_request(response):
@@ -0,0 +1,78 @@
+"""Compare the old per-category homepage queries with the single windowed query.
+
+Runs against the database configured for the app (DATABASE_URL / DB_*):
+
+    python benchmarks/bench_home.py --iterations 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import app, db, Category, Product, get_latest_products_by_top_category
+
+statement_count = 0
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statement_count
+    statement_count += 1
+
+
+def legacy_home_sections(limit=8):
+    """The pre-optimisation home() loop: one children and one products query per top category"""
+    sections = {}
+    for category in Category.query.filter_by(parent_id=None).all():
+        child_ids = [child.id for child in category.children]
+        child_ids.append(category.id)
+        sections[category.id] = Product.query.filter(
+            Product.category_id.in_(child_ids),
+            Product.is_active == True
+        ).order_by(Product.created_at.desc()).limit(limit).all()
+    return sections
+
+
+def windowed_home_sections(limit=8):
+    return get_latest_products_by_top_category(limit=limit)
+
+
+def measure(fn, iterations):
+    global statement_count
+    timings = []
+    queries = 0
+    for _ in range(iterations):
+        db.session.expunge_all()
+        statement_count = 0
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        queries = statement_count
+    return queries, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        # Warm up the pool and any server-side caches
+        legacy_home_sections()
+        windowed_home_sections()
+
+        print(f"{'variant':<10} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+        for name, fn in (('legacy', legacy_home_sections), ('windowed', windowed_home_sections)):
+            queries, timings = measure(fn, args.iterations)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{name:<10} {queries:>8} {statistics.median(timings):>9.2f} {p95:>9.2f} {timings[-1]:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
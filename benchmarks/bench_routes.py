@@ -0,0 +1,220 @@
+"""Time the storefront and admin hot paths through the Flask test client on a seeded catalogue.
+
+Runs against the database configured for the app (DATABASE_URL / DB_*) - use a scratch
+database, the catalogue is topped up to the chosen scale first (see datagen.py):
+
+    python benchmarks/bench_routes.py --scale medium --iterations 50
+    python benchmarks/bench_routes.py --scale large --depth 5 --fanout 3 --compare benchmarks/results/<earlier>.json
+
+Each case reports latency percentiles and the statements issued per call, and the run is
+saved as JSON (benchmarks/results/ by default) so later runs can be compared against it.
+The anonymous page cache is cleared before every storefront request, so those numbers are
+page-cache misses with the data caches (category tree, navigation) warm.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import (app, db, Product, User, get_category_tree, get_hierarchical_categories,
+                 invalidate_category_tree, invalidate_page_cache)
+from datagen import SCALES, SHOPPER, ADMIN, fill_cart, seed
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+BASE_URL = 'https://localhost'  # session cookies are Secure by default
+ORDER_FORM = {'first_name': 'Bench', 'last_name': 'Shopper', 'phone': '0700000000', 'address': 'Nairobi'}
+
+statement_count = 0
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statement_count
+    statement_count += 1
+
+
+def client_for(username=None):
+    client = app.test_client()
+    if username:
+        user = User.query.filter_by(username=username).first()
+        with client.session_transaction(base_url=BASE_URL) as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+    return client
+
+
+def request_case(client, method, path, **kwargs):
+    """A timed call that issues one request in a fresh app context, like a real request would"""
+    def call():
+        with app.app_context():
+            response = client.open(path, method=method, base_url=BASE_URL, **kwargs)
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}")
+    return call
+
+
+def build_cases(rng):
+    """(name, setup, call) per hot path; setup runs untimed before every iteration"""
+    tree = get_category_tree()
+    bench_roots = [category_id for category_id in tree.top_level_ids()
+                   if tree.names[category_id].startswith('Bench ')]
+    category_id = bench_roots[0] if bench_roots else tree.top_level_ids()[0]
+    product_ids = [product_id for (product_id,) in db.session.execute(
+        db.select(Product.id).where(Product.is_active == True).order_by(Product.id.desc()).limit(500)
+    )]
+    anonymous, shopper, admin = client_for(), client_for(SHOPPER), client_for(ADMIN)
+    shopper_id = User.query.filter_by(username=SHOPPER).first().id
+
+    def product_detail():
+        request_case(anonymous, 'GET', f'/product/{rng.choice(product_ids)}')()
+
+    def refill_cart():
+        with app.app_context():
+            fill_cart(shopper_id, product_ids, rng)
+            db.session.commit()
+        # Order numbers have one-second resolution - never place two orders in the same second
+        time.sleep(1 - datetime.now().microsecond / 1e6)
+
+    def hierarchical_categories():
+        with app.app_context():
+            get_hierarchical_categories()
+
+    return [
+        ('home', invalidate_page_cache, request_case(anonymous, 'GET', '/')),
+        ('category', invalidate_page_cache, request_case(anonymous, 'GET', f'/category/{category_id}')),
+        ('category_price_sort', invalidate_page_cache,
+         request_case(anonymous, 'GET', f'/category/{category_id}?sort=price_low_high')),
+        ('product_detail', invalidate_page_cache, product_detail),
+        ('search', None, request_case(anonymous, 'GET', '/search?q=bench+product')),
+        ('view_cart', None, request_case(shopper, 'GET', '/cart')),
+        ('place_order', refill_cart, request_case(shopper, 'POST', '/place-order', data=ORDER_FORM)),
+        ('view_orders', None, request_case(admin, 'GET', '/orders')),
+        # Cold: the tree is rebuilt from the database on every call
+        ('get_hierarchical_categories', invalidate_category_tree, hierarchical_categories),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def measure(setup, call, iterations, warmup):
+    global statement_count
+    timings, queries = [], []
+    for i in range(warmup + iterations):
+        if setup:
+            setup()
+        statement_count = 0
+        start = time.perf_counter()
+        call()
+        elapsed = (time.perf_counter() - start) * 1000
+        if i >= warmup:
+            timings.append(elapsed)
+            queries.append(statement_count)
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'queries': statistics.median(queries),
+        'mean_ms': statistics.fmean(timings),
+        'p50_ms': statistics.median(timings),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+        'max_ms': timings[-1],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(__file__),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    header = f"{'case':<28} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    if baseline:
+        header += f" {'p50 vs base':>12} {'queries vs base':>16}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<28} {result['queries']:>8g} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                f"{result['p99_ms']:>9.2f} {result['max_ms']:>9.2f}")
+        base = (baseline or {}).get(name)
+        if base:
+            change = (result['p50_ms'] - base['p50_ms']) / base['p50_ms'] * 100 if base['p50_ms'] else 0.0
+            line += f" {change:>+11.1f}% {result['queries'] - base['queries']:>+16g}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--products', type=int, help='override the scale preset')
+    parser.add_argument('--orders', type=int, help='override the scale preset')
+    parser.add_argument('--depth', type=int, default=3, help='levels in the seeded category trees')
+    parser.add_argument('--fanout', type=int, default=4, help='children per seeded category')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--case', action='append', help='only run these cases (repeatable)')
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/<scale>-<timestamp>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    products = args.products if args.products is not None else SCALES[args.scale]['products']
+    orders = args.orders if args.orders is not None else SCALES[args.scale]['orders']
+
+    with app.app_context():
+        started = time.perf_counter()
+        summary = seed(products, orders, depth=args.depth, fanout=args.fanout)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s: {summary}")
+
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        results = {}
+        for name, setup, call in build_cases(random.Random(7)):
+            if args.case and name not in args.case:
+                continue
+            results[name] = measure(setup, call, args.iterations, args.warmup)
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+        dialect = db.engine.dialect.name
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+    print_results(results, baseline)
+
+    run = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'dialect': dialect,
+            'scale': args.scale,
+            'products': products,
+            'orders': orders,
+            'depth': args.depth,
+            'fanout': args.fanout,
+            'iterations': args.iterations,
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.scale}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(run, output_file, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Measure worker startup: full initialization on every import versus the schema-version check.
+
+Each sample imports the app in a fresh interpreter, like a gunicorn worker booting,
+against the database configured for the app (DATABASE_URL / DB_*):
+
+    flask --app app init-db
+    python benchmarks/bench_startup.py --iterations 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Prints import wall time and the number of SQL statements sent while importing
+PROBE = """
+import time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = [0]
+@event.listens_for(Engine, 'before_cursor_execute')
+def count(*args):
+    statements[0] += 1
+import app
+print((time.perf_counter() - started) * 1000, statements[0])
+"""
+
+
+def sample(mode):
+    env = dict(os.environ, DB_INIT_ON_IMPORT=mode)
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[-2]), int(output[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'queries':>8} {'p50 ms':>9} {'max ms':>9}")
+    # always = the old behaviour, every worker runs initialize_database()
+    for mode in ('always', 'auto'):
+        samples = [sample(mode) for _ in range(args.iterations)]
+        timings = sorted(ms for ms, statements in samples)
+        print(f"{mode:<8} {samples[-1][1]:>8} {statistics.median(timings):>9.2f} {timings[-1]:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
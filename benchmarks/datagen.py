@@ -0,0 +1,150 @@
+"""Synthetic catalogue generator shared by the benchmark scripts.
+
+Seeding tops the database up to the requested scale, so repeated runs reuse what is
+already there. Everything it creates is recognisable by name ("Bench ..." categories
+and products, BENCH order numbers, bench-* users); use a scratch database.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import (db, Category, Product, Cart, Order, OrderItem, HotSale, User,
+                 ORDER_STATUSES, invalidate_category_tree, rebuild_sales_rollup)
+
+BENCH_PREFIX = 'Bench product'
+SHOPPER, ADMIN = 'bench-shopper', 'bench-admin'
+SCALES = {
+    'small': {'products': 100, 'orders': 50},
+    'medium': {'products': 10000, 'orders': 5000},
+    'large': {'products': 100000, 'orders': 50000},
+}
+CHUNK = 1000
+
+
+def bench_user(username, is_admin=False):
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        user = User(username=username, password=generate_password_hash(os.urandom(16).hex()),
+                    is_admin=is_admin)
+        db.session.add(user)
+        db.session.flush()
+    return user
+
+
+def seed_categories(depth, fanout):
+    """`fanout` top-level "Bench N" categories, each `depth` levels deep with `fanout` children per node"""
+    existing = {name: category_id for name, category_id in db.session.execute(
+        db.select(Category.name, Category.id).where(Category.name.like('Bench %'))
+    )}
+    level = [(None, 'Bench')]
+    for _ in range(depth):
+        next_level = []
+        for parent_id, parent_name in level:
+            for i in range(1, fanout + 1):
+                name = f'{parent_name} {i}' if parent_id is None else f'{parent_name}.{i}'
+                if name not in existing:
+                    category = Category(name=name, parent_id=parent_id)
+                    db.session.add(category)
+                    db.session.flush()
+                    existing[name] = category.id
+                next_level.append((existing[name], name))
+        level = next_level
+    invalidate_category_tree()
+    return list(existing.values())
+
+
+def seed_products(products, category_ids, rng, now):
+    existing = db.session.execute(
+        db.select(db.func.count(Product.id)).where(Product.name.like(f'{BENCH_PREFIX} %'))
+    ).scalar()
+    rows = [
+        {
+            'name': f'{BENCH_PREFIX} {i}',
+            'description': f'Seeded product {i} with {rng.choice(["steel", "oak", "glass", "cotton"])} trim',
+            'price': float(rng.randint(100, 20000)),
+            'discount': rng.choice([0.0, 0.0, 0.0, 10.0, 25.0]),
+            'category_id': rng.choice(category_ids),
+            'created_at': now - timedelta(minutes=rng.randint(0, 525600)),
+            'is_scraped': False,
+            'is_active': rng.random() > 0.1,
+        }
+        for i in range(existing, products)
+    ]
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(db.insert(Product), rows[start:start + CHUNK])
+    return len(rows)
+
+
+def seed_orders(orders, product_ids, rng, now):
+    existing = Order.query.filter(Order.order_number.like('BENCH%')).count()
+    rows = [
+        {
+            'order_number': f'BENCH{i:08d}',
+            'first_name': 'Bench', 'last_name': 'Shopper', 'phone': '0700000000',
+            'address': 'Nairobi', 'total_amount': 0.0,
+            'status': rng.choice(ORDER_STATUSES),
+            'created_at': now - timedelta(minutes=rng.randint(0, 525600)),
+        }
+        for i in range(existing, orders)
+    ]
+    for start in range(0, len(rows), CHUNK):
+        order_ids = db.session.execute(
+            db.insert(Order).returning(Order.id), rows[start:start + CHUNK]
+        ).scalars().all()
+        db.session.execute(db.insert(OrderItem), [
+            {'order_id': order_id, 'product_id': rng.choice(product_ids),
+             'quantity': rng.randint(1, 3), 'price': float(rng.randint(100, 20000))}
+            for order_id in order_ids for _ in range(rng.randint(1, 4))
+        ])
+    if rows:
+        db.session.execute(db.update(Order).where(Order.order_number.like('BENCH%')).values(
+            total_amount=db.select(db.func.sum(OrderItem.quantity * OrderItem.price))
+            .where(OrderItem.order_id == Order.id).scalar_subquery()
+        ))
+        rebuild_sales_rollup()
+    return len(rows)
+
+
+def fill_cart(user_id, product_ids, rng, lines=10):
+    """Replace a user's cart with `lines` random products"""
+    Cart.query.filter_by(user_id=user_id).delete()
+    db.session.execute(db.insert(Cart), [
+        {'user_id': user_id, 'product_id': product_id, 'quantity': rng.randint(1, 3),
+         'added_at': datetime.utcnow()}
+        for product_id in rng.sample(product_ids, min(lines, len(product_ids)))
+    ])
+
+
+def seed(products, orders, depth=3, fanout=4, seed=42):
+    """Top the database up to the given scale; returns a summary dict"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    category_ids = seed_categories(depth, fanout)
+    new_products = seed_products(products, category_ids, rng, now)
+    product_ids = [product_id for (product_id,) in db.session.execute(
+        db.select(Product.id).where(Product.is_active == True)
+    )]
+
+    shopper = bench_user(SHOPPER)
+    bench_user(ADMIN, is_admin=True)
+    if not Cart.query.filter_by(user_id=shopper.id).count():
+        fill_cart(shopper.id, product_ids, rng)
+    if not HotSale.query.count():
+        db.session.execute(db.insert(HotSale), [
+            {'product_id': product_id, 'position': position, 'created_at': now}
+            for position, product_id in enumerate(rng.sample(product_ids, min(8, len(product_ids))))
+        ])
+    new_orders = seed_orders(orders, product_ids, rng, now)
+    db.session.commit()
+
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('ANALYZE')
+    return {
+        'categories': len(category_ids),
+        'products_added': new_products,
+        'orders_added': new_orders,
+    }
@@ -0,0 +1,181 @@
+"""EXPLAIN ANALYZE the SQL behind the storefront and admin routes, before and after the hot-query indexes.
+
+PostgreSQL only, against the database configured for the app (DATABASE_URL / DB_*).
+Point it at a staging copy: the "before" plans run in a transaction that drops the
+indexes from migrations/versions/e8a3c5f7b912 and is rolled back, which locks the
+affected tables while it runs.
+
+    python benchmarks/explain_hot_queries.py --seed 20000
+    python benchmarks/explain_hot_queries.py --route category-price --route admin-orders
+    python benchmarks/explain_hot_queries.py --summary
+"""
+import argparse
+import importlib.util
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import app, db, Product, User, get_category_tree
+from datagen import SHOPPER, ADMIN, bench_user, seed
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions',
+                         'e8a3c5f7b912_hot_query_indexes.py')
+BASE_URL = 'https://localhost'  # session cookies are Secure by default
+
+# (name, path, user) - {category} and {product} are filled from the seeded data
+ROUTES = [
+    ('home', '/', None),
+    ('category-newest', '/category/{category}', None),
+    ('category-price', '/category/{category}?sort=price_low_high', None),
+    ('category-name', '/category/{category}?sort=name_asc', None),
+    ('product', '/product/{product}', None),
+    ('search', '/search?q=bench', None),
+    ('cart', '/cart', SHOPPER),
+    ('admin-dashboard', '/admin/dashboard', ADMIN),
+    ('admin-orders', '/orders', ADMIN),
+    ('admin-hot-sales', '/admin/hot-sales', ADMIN),
+]
+
+
+def hot_index_names():
+    """Index names from the migration, so the script and the schema cannot drift"""
+    spec = importlib.util.spec_from_file_location('hot_query_indexes', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return [name for name, table, columns, partial in module.INDEXES]
+
+
+def route_paths():
+    """Fill the route placeholders with the busiest top-level category and a seeded product"""
+    tree = get_category_tree()
+    counts = dict(db.session.execute(
+        db.select(Product.category_id, db.func.count(Product.id))
+        .where(Product.is_active == True).group_by(Product.category_id)
+    ).all())
+    category = max(
+        tree.top_level_ids(),
+        key=lambda top_id: sum(counts.get(category_id, 0) for category_id in tree.subtree_ids(top_id)),
+        default=0
+    )
+    product = db.session.execute(
+        db.select(Product.id).where(Product.is_active == True).order_by(Product.id.desc()).limit(1)
+    ).scalar() or 0
+    return {'category': category, 'product': product}
+
+
+def capture(path, username):
+    """Request a route and return the distinct read statements it sent, in order"""
+    client = app.test_client()
+    if username:
+        user = User.query.filter_by(username=username).first()
+        with client.session_transaction(base_url=BASE_URL) as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        # A fresh app context per request, so g (logged-in user, cart pricing) starts empty
+        with app.app_context():
+            response = client.get(path, base_url=BASE_URL)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    if response.status_code != 200:
+        print(f"warning: {path} returned {response.status_code}", file=sys.stderr)
+
+    seen = set()
+    unique = []
+    for statement, parameters in statements:
+        key = (statement, repr(parameters))
+        if key not in seen:
+            seen.add(key)
+            unique.append((statement, parameters))
+    return unique
+
+
+def explain(connection, statement, parameters):
+    plan = [row[0] for row in connection.exec_driver_sql(
+        'EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters
+    )]
+    match = re.search(r'Execution Time: ([\d.]+) ms', plan[-1]) if plan else None
+    return plan, float(match.group(1)) if match else 0.0
+
+
+def explain_all(connection, captured):
+    return {name: [explain(connection, statement, parameters) for statement, parameters in statements]
+            for name, statements in captured.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=0, metavar='PRODUCTS',
+                        help='top the catalogue up to this many products, a quarter as many orders (see datagen.py)')
+    parser.add_argument('--route', action='append', choices=[name for name, path, user in ROUTES],
+                        help='only explain these routes (repeatable)')
+    parser.add_argument('--summary', action='store_true', help='print timings only, no plans')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            sys.exit('EXPLAIN ANALYZE plans need PostgreSQL - set DATABASE_URL')
+        if args.seed:
+            print(f"Seeded: {seed(args.seed, args.seed // 4)}")
+        bench_user(SHOPPER)
+        bench_user(ADMIN, is_admin=True)
+        db.session.commit()
+
+        index_names = hot_index_names()
+        present = {name for (name,) in db.session.execute(db.text(
+            'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()'
+        ))}
+        missing = [name for name in index_names if name not in present]
+        if missing:
+            print(f"warning: not built yet, run `flask db upgrade`: {', '.join(missing)}", file=sys.stderr)
+
+        placeholders = route_paths()
+        routes = [(name, path.format(**placeholders), user) for name, path, user in ROUTES
+                  if not args.route or name in args.route]
+        captured = {name: capture(path, user) for name, path, user in routes}
+        db.session.remove()
+
+        with db.engine.connect() as connection:
+            transaction = connection.begin()
+            for name in index_names:
+                connection.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+            before = explain_all(connection, captured)
+            transaction.rollback()
+            after = explain_all(connection, captured)
+            connection.rollback()
+
+        for name, path, user in routes:
+            print(f"\n=== {name}: GET {path} ({len(captured[name])} statements) ===")
+            if args.summary:
+                continue
+            for (statement, parameters), (plan_before, ms_before), (plan_after, ms_after) in zip(
+                captured[name], before[name], after[name]
+            ):
+                print('\n' + ' '.join(statement.split())[:200])
+                for label, plan, ms in (('before', plan_before, ms_before), ('after', plan_after, ms_after)):
+                    print(f"--- {label} ({ms:.2f} ms)")
+                    for line in plan:
+                        print('    ' + line)
+
+        print(f"\n{'route':<18} {'queries':>8} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for name, path, user in routes:
+            ms_before = sum(ms for plan, ms in before[name])
+            ms_after = sum(ms for plan, ms in after[name])
+            speedup = ms_before / ms_after if ms_after else 0.0
+            print(f"{name:<18} {len(captured[name]):>8} {ms_before:>10.2f} {ms_after:>10.2f} {speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""Gunicorn settings, loaded automatically from the working directory by `gunicorn app:app`"""
+import os
+import shutil
+import tempfile
+
+# Workers write their metrics here and /metrics aggregates the files. It has to be set
+# before a worker imports the app, which is why it lives in the gunicorn config.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'bravo-prometheus'))
+
+
+def on_starting(server):
+    """Start from an empty metrics directory so files from a previous master don't linger"""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges (in-flight requests, pool usage, RSS)"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
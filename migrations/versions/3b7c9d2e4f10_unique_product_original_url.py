@@ -0,0 +1,38 @@
+"""Unique index on product.original_url for scraper upserts
+
+Revision ID: 3b7c9d2e4f10
+Revises: fe026fe51734
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c9d2e4f10'
+down_revision = 'fe026fe51734'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Earlier scrapes inserted duplicates - keep the newest row per URL active
+    op.execute("""
+        UPDATE product SET original_url = NULL, is_active = FALSE
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY original_url ORDER BY created_at DESC, id DESC
+                ) AS row_number
+                FROM product
+                WHERE original_url IS NOT NULL
+            ) ranked
+            WHERE row_number > 1
+        )
+    """)
+    op.create_index('ix_product_original_url', 'product', ['original_url'], unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_product_original_url', table_name='product')
@@ -0,0 +1,41 @@
+"""Scrape job table for background product scraping
+
+Revision ID: 5d1e8a3c7b42
+Revises: 3b7c9d2e4f10
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e8a3c7b42'
+down_revision = '3b7c9d2e4f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scrape_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('total_items', sa.Integer(), nullable=True),
+    sa.Column('processed_items', sa.Integer(), nullable=True),
+    sa.Column('added', sa.Integer(), nullable=True),
+    sa.Column('updated', sa.Integer(), nullable=True),
+    sa.Column('unchanged', sa.Integer(), nullable=True),
+    sa.Column('failed_images', sa.Integer(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('scrape_job')
@@ -0,0 +1,35 @@
+"""Unique index on cart (user_id, product_id) for add-to-cart upserts
+
+Revision ID: 7a2f4c9e1b63
+Revises: 5d1e8a3c7b42
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2f4c9e1b63'
+down_revision = '5d1e8a3c7b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Concurrent clicks could insert the same product twice - fold duplicates into the oldest row
+    op.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(duplicate.quantity) FROM cart duplicate
+            WHERE duplicate.user_id = cart.user_id AND duplicate.product_id = cart.product_id
+        )
+        WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id HAVING COUNT(*) > 1)
+    """)
+    op.execute("""
+        DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id)
+    """)
+    op.create_index('uq_cart_user_product', 'cart', ['user_id', 'product_id'], unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('uq_cart_user_product', table_name='cart')
@@ -0,0 +1,39 @@
+"""Full-text search column and GIN indexes on product (PostgreSQL only)
+
+Revision ID: b3e5a7c1d924
+Revises: 9c4b6e2d8a15
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e5a7c1d924'
+down_revision = '9c4b6e2d8a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("""
+        ALTER TABLE product ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_product_search_vector ON product USING GIN (search_vector)")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING GIN (name gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_product_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_product_search_vector")
+    op.execute("ALTER TABLE product DROP COLUMN IF EXISTS search_vector")
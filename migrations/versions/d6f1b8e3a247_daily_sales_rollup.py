@@ -0,0 +1,36 @@
+"""Daily sales rollup table
+
+Revision ID: d6f1b8e3a247
+Revises: b3e5a7c1d924
+Create Date: 2026-10-17 14:00:00.000000
+
+Run `flask rebuild-sales-rollup` (or restart the app) to backfill existing orders.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f1b8e3a247'
+down_revision = 'b3e5a7c1d924'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('items', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_daily_sales_day_status_category', 'daily_sales', ['day', 'status', 'category_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_daily_sales_day_status_category', table_name='daily_sales')
+    op.drop_table('daily_sales')
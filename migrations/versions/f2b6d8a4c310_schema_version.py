@@ -0,0 +1,30 @@
+"""Schema version stamp checked at startup
+
+Revision ID: f2b6d8a4c310
+Revises: e8a3c5f7b912
+Create Date: 2026-10-17 16:00:00.000000
+
+`flask init-db` stamps the row; workers read it at import and skip initialization when current.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d8a4c310'
+down_revision = 'e8a3c5f7b912'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('schema_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.String(length=32), nullable=False),
+    sa.Column('initialized_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('schema_version')
@@ -19,8 +19,25 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize cart count from session storage
     const cartCount = sessionStorage.getItem('cart_count');
     if (cartCount) {
+        updateCartBadges(cartCount);
+    }
+
+    // Pages served from the shared page cache are rendered without a cart count
+    const cartCountUrl = document.body.dataset.cartCountUrl;
+    if (cartCountUrl) {
+        fetch(cartCountUrl, { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(data => {
+                updateCartBadges(data.cart_count);
+                sessionStorage.setItem('cart_count', data.cart_count);
+            })
+            .catch(error => console.error('Error loading cart count:', error));
+    }
+
+    function updateCartBadges(count) {
         document.querySelectorAll('.cart-count').forEach(el => {
-            el.textContent = cartCount;
+            el.textContent = count;
+            el.style.display = parseInt(count) > 0 ? '' : 'none';
         });
     }
 
@@ -28,6 +45,7 @@ document.addEventListener('DOMContentLoaded', function() {
     document.querySelectorAll('.cart-quantity-btn').forEach(button => {
         button.addEventListener('click', function() {
             const form = this.closest('form');
+            if (!form) return;  // The cart page batches its own quantity changes
             const input = form.querySelector('.cart-quantity');
             let quantity = parseInt(input.value);
             
@@ -267,7 +285,7 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             
             searchTimeout = setTimeout(() => {
-                fetch(`/search?q=${encodeURIComponent(query)}&ajax=1`)
+                fetch(`/search/suggest?q=${encodeURIComponent(query)}`)
                     .then(response => response.json())
                     .then(data => {
                         if (data.products && data.products.length > 0) {
@@ -289,7 +307,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 html += `
                     <div class="search-result-item">
                         <a href="/product/${product.id}" class="d-flex align-items-center text-decoration-none text-dark">
-                            <img src="${product.image ? '/static/uploads/' + product.image : '/static/images/no-image.png'}" 
+                            <img src="${product.thumbnail || '/static/images/no-image.png'}" 
                                  alt="${product.name}" class="search-result-img">
                             <div class="search-result-info">
                                 <h6 class="mb-1">${product.name}</h6>